@@ -1,118 +1,284 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from pandas.api.types import union_categoricals
+from matplotlib import colormaps
+from matplotlib.figure import Figure
 import networkx as nx
 import db
+from models import extract_city
 
 
-def get_orders_df():
-    """Загружает заказы из базы данных в DataFrame."""
-    orders_data = db.get_all_orders()
-    if not orders_data:
+# Сколько заказов читается из базы за один шаг при загрузке в DataFrame
+ORDERS_CHUNK_SIZE = 50000
+
+
+def get_orders_df(chunk_size=ORDERS_CHUNK_SIZE):
+    """Загружает заказы из базы данных в DataFrame.
+
+    Строки курсора порциями раскладываются сразу в типизированные столбцы: id — int64,
+    total_cost — float64, client_name — category, order_date — datetime64 (каждая дата
+    разбирается один раз, по формату ISO 8601). Промежуточные объекты Order и словари
+    не создаются, а в памяти одновременно находится не больше одной порции строк.
+    """
+    ids, names, dates, totals = [], [], [], []
+    for rows in db.iter_order_chunks(chunk_size):
+        order_ids, client_names, order_dates, costs = zip(*rows)
+        ids.append(np.fromiter(order_ids, dtype=np.int64, count=len(rows)))
+        names.append(pd.Categorical(client_names))
+        dates.append(pd.to_datetime(order_dates, format='ISO8601').to_numpy(dtype='datetime64[ns]'))
+        totals.append(np.fromiter(costs, dtype=np.float64, count=len(rows)))
+    if not ids:
         return pd.DataFrame()
 
-    # Собираем данные из объектов Order
-    data = [{
-        'id': order.id,
-        'client_name': order.client_name,
-        'order_date': order.order_date,
-        'total_cost': order.total_cost
-    } for order in orders_data]
+    return pd.DataFrame({
+        'id': np.concatenate(ids),
+        'client_name': union_categoricals(names),
+        'order_date': np.concatenate(dates),
+        'total_cost': np.concatenate(totals),
+    })
 
-    df = pd.DataFrame(data)
-    df['order_date'] = pd.to_datetime(df['order_date'])
-    return df
 
-def get_top_clients(n=5):
-    """Возвращает топ-N клиентов по общему объему покупок."""
-    df = get_orders_df()
-    if df.empty:
+def get_top_clients(n=5, date_from=None, date_to=None, city=None, refresh=True):
+    """Возвращает топ-N клиентов по общему объему покупок (необязательно — за период и по городу)."""
+    # Группировка и отбор выполняются в базе, сюда приходят только N строк
+    rows = db.get_top_clients(n, date_from, date_to, city, refresh)
+    if not rows:
         return pd.Series(dtype=str)
 
-    # grouped = df.groupby('client_name').sum()['total_cost']
-    grouped = df.groupby('client_name')['total_cost'].sum()
-    return grouped.nlargest(n)
+    names, totals = zip(*rows)
+    return pd.Series(totals, index=pd.Index(names, name='client_name'), name='total_cost')
+
+
+def get_daily_revenue(date_from=None, date_to=None, city=None, refresh=True):
+    """Загружает выручку по дням, посчитанную в базе, в DataFrame (order_date, total_cost).
+
+    Необязательные границы периода, город клиента и refresh передаются в db.get_daily_revenue.
+    """
+    rows = db.get_daily_revenue(date_from, date_to, city, refresh)
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows, columns=['order_date', 'total_cost', 'orders_count'])
+    df['order_date'] = pd.to_datetime(df['order_date'], format='%Y-%m-%d').dt.date
+    return df
+
+
+# Результаты расчётов, привязанные к водяному знаку данных: (файл базы, имя) -> (водяной знак, результат)
+_watermark_cache = {}
+
+
+def _cached(name, watermark, compute):
+    """Возвращает compute() из кэша, если данные с тех пор не менялись (водяной знак тот же)."""
+    key = (db.DB_FILE, name)
+    hit = _watermark_cache.get(key)
+    if hit is not None and hit[0] == watermark:
+        return hit[1]
+    value = compute()
+    _watermark_cache[key] = (watermark, value)
+    return value
+
+
+def load_order_dynamics():
+    """Возвращает (водяной знак, выручка по дням) для графика динамики.
+
+    Водяной знак — последний учтённый id заказа: пока новых заказов нет, данные берутся
+    из кэша, а по совпадению знака интерфейс понимает, что график можно не перерисовывать.
+    """
+    watermark = db.refresh_analytics()
+    return watermark, _cached("daily_revenue", watermark, get_daily_revenue)
+
+
+def load_client_geography():
+    """Возвращает (водяной знак, раскладка графа) для графика географии; раскладка кэшируется до появления новых клиентов."""
+    watermark = db.get_last_id("clients")
+    return watermark, _cached("client_geography", watermark, client_geography_layout)
+
+
+def _chart_axes(fig, kind):
+    """Возвращает оси фигуры для графика вида kind.
+
+    Если на фигуре уже нарисован график того же вида, возвращаются его оси, чтобы
+    обновить только данные; иначе фигура очищается и оси создаются заново.
+    """
+    if fig.get_label() != kind or not fig.axes:
+        fig.clear()
+        fig.set_label(kind)
+        fig.add_subplot()
+    return fig.axes[0]
+
 
+# Шаги группировки выручки от мелкого к крупному: правило pandas resample, подпись в заголовке, формат даты
+REVENUE_FREQUENCIES = (
+    ("D", "по дням", "%Y-%m-%d"),
+    ("W-MON", "по неделям", "%Y-%m-%d"),
+    ("MS", "по месяцам", "%Y-%m"),
+    ("QS", "по кварталам", "%Y-%m"),
+    ("YS", "по годам", "%Y"),
+)
+# Сколько пикселей ширины холста приходится на одну точку графика динамики
+PIXELS_PER_POINT = 4
+# До скольких точек динамика рисуется столбцами; длиннее — линией с заливкой
+MAX_BARS = 31
 
-def plot_order_dynamics():
 
-    """Строит график динамики заказов по месяцам."""
-    df = get_orders_df()
-    if df.empty:
+def resample_revenue(daily_rev, max_points):
+    """Группирует выручку по дням в самые мелкие периоды, которых не больше max_points.
+
+    Возвращает (DataFrame с столбцами order_date, total_cost, orders_count; индекс шага
+    в REVENUE_FREQUENCIES). Число точек ограничено, поэтому время построения графика
+    не зависит от длины истории.
+    """
+    by_date = daily_rev.set_index(pd.to_datetime(daily_rev['order_date']))[['total_cost', 'orders_count']]
+    for step, (rule, _, _) in enumerate(REVENUE_FREQUENCIES):
+        resampled = by_date.resample(rule, closed='left', label='left').sum()
+        if len(resampled) <= max_points or step == len(REVENUE_FREQUENCIES) - 1:
+            return resampled.rename_axis('order_date').reset_index(), step
+
+
+def plot_order_dynamics(daily_rev=None, fig=None, max_points=None):
+    """Строит график динамики продаж.
+
+    daily_rev — заранее загруженный get_daily_revenue() (например, в фоновом потоке);
+    если не передан, данные загружаются здесь. fig — фигура matplotlib, на которой
+    рисуется график (по умолчанию создаётся новая).
+
+    Выручка группируется по дням, неделям, месяцам и т. д. так, чтобы точек было не
+    больше max_points (по умолчанию — ширина фигуры в пикселях / PIXELS_PER_POINT).
+    Короткий ряд рисуется столбцами, длинный — линией с заливкой. Если на fig уже есть
+    этот график того же вида, меняются только данные его элементов.
+    """
+    if daily_rev is None:
+        daily_rev = get_daily_revenue()
+    if daily_rev.empty:
+        return None
+    if fig is None:
+        fig = Figure(figsize=(10, 6))
+    if max_points is None:
+        max_points = max(int(fig.get_figwidth() * fig.dpi) // PIXELS_PER_POINT, 1)
+
+    series, step = resample_revenue(daily_rev, max_points)
+    _, period, date_format = REVENUE_FREQUENCIES[step]
+    dates = series['order_date']
+    values = series['total_cost'].to_numpy()
+    mode = "bar" if len(values) <= MAX_BARS else "area"
+
+    ax = _chart_axes(fig, f"order_dynamics:{mode}")
+    rebuilt = not ax.containers and not ax.lines
+    if mode == "bar":
+        bars = ax.containers[0] if ax.containers else None
+        if bars is not None and len(bars) == len(values):
+            # Тот же набор периодов: обновляем только высоты столбцов
+            for bar, value in zip(bars, values):
+                bar.set_height(value)
+        else:
+            if bars is not None:
+                bars.remove()
+            positions = np.arange(len(values))
+            colors = colormaps['viridis'](np.linspace(0, 1, len(values)))
+            ax.bar(positions, values, color=colors)
+            ax.set_xticks(positions)
+            ax.tick_params(axis='x', labelrotation=45)
+            rebuilt = True
+        ax.set_xticklabels(dates.dt.strftime(date_format), ha='right')
+    else:
+        # Длинный ряд: одна линия и одна заливка, подписи дат расставляет ось
+        if ax.lines:
+            ax.lines[0].set_data(dates, values)
+            ax.collections[0].remove()
+        else:
+            ax.plot(dates, values, color=colormaps['viridis'](0.3))
+        ax.fill_between(dates, values, color=colormaps['viridis'](0.3), alpha=0.3)
+        ax.set_ylim(0, values.max() * 1.05 or 1)
+
+    if rebuilt:
+        # Оформляем график
+        ax.set_xlabel('Дата')
+        ax.set_ylabel('Суммарная выручка (Руб)')
+        ax.grid(axis='y', alpha=0.3)
+        ax.set_axisbelow(True)
+    ax.set_title(f'Динамика продаж {period}')
+    ax.relim()
+    ax.autoscale_view()
+    if rebuilt:
+        fig.tight_layout()
+    return fig
+
+# Сколько самых крупных городов показывается на графе географии (остальные объединяются)
+GEOGRAPHY_MAX_CITIES = 30
+# Сколько итераций раскладки выполняет nx.spring_layout
+GEOGRAPHY_LAYOUT_ITERATIONS = 50
+OTHER_CITIES = "Другие города"
+
+
+def client_geography_layout(max_cities=GEOGRAPHY_MAX_CITIES, clients_per_city=0, seed=42, backfill=True):
+    """Строит граф городов клиентов и раскладку его вершин без отрисовки.
+
+    Число клиентов по городам считается в базе группировкой по индексу clients.city,
+    адреса при этом не разбираются. Вершины графа — города с атрибутом count (число
+    клиентов); города сверх max_cities объединяются в одну вершину. При
+    clients_per_city > 0 к каждому городу звездой присоединяется случайная выборка
+    из стольких клиентов, так что размер графа, а с ним и стоимость раскладки,
+    ограничены независимо от размера базы.
+
+    Возвращает (граф, позиции вершин) или None, если клиентов меньше двух.
+    Не обращается к matplotlib, поэтому может выполняться в фоновом потоке.
+    backfill=False — не дозаполнять города (и не писать в базу), если это сделано заранее.
+    """
+    # Города клиентов из старых баз дозаполняются при первом построении графа
+    if backfill:
+        db.backfill_client_cities()
+    counts = db.get_city_counts()
+    total = sum(count for _, count in counts)
+    if total < 2:
         return None
 
-    # Преобразуем столбец с датами в формат datetime
-    df['order_date'] = pd.to_datetime(df['order_date'])
-    daily_rev = df.groupby(df['order_date'].dt.date)['total_cost'].sum().reset_index()
+    top = counts[:max_cities]
+    rest = total - sum(count for _, count in top)
 
-    # Настраиваем внешний вид графика
-    sns.set(style="whitegrid")
-    plt.figure(figsize=(10, 6))
+    G = nx.Graph()
+    for city, count in top:
+        G.add_node(city, kind="city", count=count)
+        if clients_per_city > 0:
+            for i, name in enumerate(db.get_city_clients_sample(city, clients_per_city)):
+                client_node = (city, i)
+                G.add_node(client_node, kind="client", label=name, count=1)
+                G.add_edge(city, client_node)
+    if rest:
+        G.add_node(OTHER_CITIES, kind="city", count=rest)
 
-    # Строим динамику продаж
-    sns.barplot(x='order_date', y='total_cost', data=daily_rev, palette='viridis')
+    return G, nx.spring_layout(G, iterations=GEOGRAPHY_LAYOUT_ITERATIONS, seed=seed)
 
-    # Оформляем график
-    plt.title('Динамика продаж по дням')
-    plt.xlabel('Дата')
-    plt.ylabel('Суммарная выручка (Руб)')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    # 250827
 
-    return plt.gcf()
+def plot_client_geography_graph(layout=None, fig=None):
+    """Визуализирует сеть городов, где живут ваши клиенты.
 
-def plot_client_geography_graph():
-    """Визуализирует сеть городов, где живут ваши клиенты."""
-    clients = db.get_all_clients()
-    if len(clients) < 2:
-        fig, ax = plt.subplots()
+    Размер вершины города пропорционален числу клиентов в нём.
+    layout — результат client_geography_layout(); если не передан, вычисляется здесь.
+    fig — фигура matplotlib, на которой рисуется граф (по умолчанию создаётся новая).
+    """
+    if layout is None:
+        layout = client_geography_layout()
+    if fig is None:
+        fig = Figure()
+    ax = _chart_axes(fig, "client_geography")
+    ax.clear()
+    ax.set_axis_off()
+    if layout is None:
         ax.text(0.5, 0.5, "Недостаточно клиентов для построения графа.", ha='center')
         return fig
 
-    G = nx.Graph()
-    cities = {}
-    for client in clients:
-        city = extract_city(client.address)
-        if city not in cities:
-            cities[city] = []
-        cities[city].append(client.name)
-
-    # Построение графа
-    for city, names in cities.items():
-        G.add_node(city)
-        for i in range(len(names)):
-            for j in range(i + 1, len(names)):
-                G.add_edge(names[i], names[j], weight=1)
-
-    pos = nx.spring_layout(G)
-    nx.draw_networkx_nodes(G, pos, node_color="skyblue", alpha=0.8)
-    nx.draw_networkx_edges(G, pos, edge_color="gray", alpha=0.5)
-    nx.draw_networkx_labels(G, pos, font_size=10, font_family="sans-serif")
-    plt.axis("off")
-    return plt.gcf()
-
-def extract_city(address, depth=0, max_depth=3):
-    """Извлекает город из адреса."""
-    if not address or depth >= max_depth:
-        return "Неизвестно"
-    parts = address.strip().split(',')
-    first_part = parts[0].strip()
-
-    # Сначала проверяем стандартную схему, когда "г." или "город" стоят ДО названия города
-    if "г." in first_part or "город" in first_part.lower() or "гор." in first_part.lower():
-        # Проверяем, не является ли "г." или "город" частью первого элемента
-        sub_parts = first_part.split()
-        if len(sub_parts) > 1 and sub_parts[-1].lower() in ["г.", "город", "гор."]:
-            return sub_parts[:-1][-1]  # Возвращаем предпоследнюю часть (название города)
-        else:
-            return "Неизвестно"
-    elif first_part.isalpha():  # Если городской блок указан явно
-        return first_part
-    elif depth < max_depth:
-        return extract_city(','.join(parts[1:]), depth + 1)
-    else:
-        return "Неизвестно"
+    G, pos = layout
+    cities = [node for node, kind in G.nodes(data="kind") if kind == "city"]
+    clients = [node for node, kind in G.nodes(data="kind") if kind == "client"]
+    largest = max(G.nodes[city]["count"] for city in cities)
+    sizes = [300 + 2700 * G.nodes[city]["count"] / largest for city in cities]
+
+    nx.draw_networkx_nodes(G, pos, nodelist=cities, node_size=sizes, node_color="skyblue", alpha=0.8, ax=ax)
+    if clients:
+        nx.draw_networkx_nodes(G, pos, nodelist=clients, node_size=40, node_color="lightgray", ax=ax)
+        nx.draw_networkx_edges(G, pos, edge_color="gray", alpha=0.5, ax=ax)
+    labels = {city: f"{city}\n{G.nodes[city]['count']}" for city in cities}
+    nx.draw_networkx_labels(G, pos, labels=labels, font_size=10, font_family="sans-serif", ax=ax)
+    return fig
 
 def sort_orders(orders, by='total_cost', reverse=True):
     """Сортирует заказы по указанному полю."""
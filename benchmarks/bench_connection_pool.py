@@ -0,0 +1,92 @@
+"""Замер задержки одного вызова db.get_all_clients / db.add_client до и после пула соединений.
+
+"До" воспроизводит старое поведение: каждое обращение открывает новое sqlite3.connect(DB_FILE)
+без дополнительных настроек. "После" использует db.get_connection() с пулом и PRAGMA.
+
+Запуск из корня проекта:
+    python benchmarks/bench_connection_pool.py --rows 100000
+"""
+import argparse
+import os
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from models import Client  # noqa: E402
+
+
+def legacy_get_connection():
+    """Прежняя реализация: новое соединение на каждый вызов."""
+    conn = sqlite3.connect(db.DB_FILE)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def fill_clients(rows):
+    """Заполняет таблицу клиентов синтетическими данными."""
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)",
+            ((f"Клиент {i}", f"client{i}@example.com", f"+7900{i:07d}", "Москва, ул. Ленина, д. 1")
+             for i in range(rows))
+        )
+
+
+def measure(func, repeat):
+    """Возвращает медианное время одного вызова в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def run(label, repeat_read, repeat_write):
+    counter = iter(range(10 ** 9))
+
+    def add_one():
+        i = next(counter)
+        db.add_client(Client(f"Новый {label} {i}", f"new-{label}-{i}@example.com", "+79000000000", "Омск"))
+
+    read_ms = measure(db.get_all_clients, repeat_read)
+    write_ms = measure(add_one, repeat_write)
+    print(f"{label:>6}: get_all_clients {read_ms:9.2f} мс   add_client {write_ms:7.3f} мс")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000, help="количество клиентов в базе")
+    parser.add_argument("--repeat-read", type=int, default=5)
+    parser.add_argument("--repeat-write", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db.DB_FILE = os.path.join(tmp_dir, "bench_shop.db")
+        db.create_tables()
+        fill_clients(args.rows)
+        db.close_connections()
+        print(f"Клиентов в базе: {args.rows}")
+
+        # "До": режим журнала по умолчанию и новое соединение на каждый вызов
+        with sqlite3.connect(db.DB_FILE) as conn:
+            conn.execute("PRAGMA journal_mode=DELETE")
+        pooled_get_connection = db.get_connection
+        db.get_connection = legacy_get_connection
+        try:
+            run("до", args.repeat_read, args.repeat_write)
+        finally:
+            db.get_connection = pooled_get_connection
+
+        # "После": пул соединений с WAL и настроенными PRAGMA
+        run("после", args.repeat_read, args.repeat_write)
+        db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
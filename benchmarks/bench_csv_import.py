@@ -0,0 +1,50 @@
+"""Замер скорости импорта клиентов из CSV через db.import_data_from_csv.
+
+Запуск из корня проекта:
+    python benchmarks/bench_csv_import.py --rows 500000
+"""
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+def write_csv(path, rows):
+    """Пишет CSV с синтетическими клиентами (каждая сотая строка — дубликат email)."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "email", "phone", "address"])
+        for i in range(rows):
+            n = i - 1 if i % 100 == 99 else i
+            writer.writerow([f"Клиент {i}", f"client{n}@example.com", f"+7900{i:07d}", "Москва, ул. Ленина, д. 1"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500_000, help="количество строк в CSV")
+    parser.add_argument("--batch-size", type=int, default=db.IMPORT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        csv_path = os.path.join(tmp_dir, "clients.csv")
+        write_csv(csv_path, args.rows)
+        db.DB_FILE = os.path.join(tmp_dir, "bench_shop.db")
+        db.create_tables()
+
+        start = time.perf_counter()
+        report = db.import_data_from_csv(csv_path, batch_size=args.batch_size)
+        elapsed = time.perf_counter() - start
+        db.close_connections()
+
+    print(report)
+    print(f"Время: {elapsed:.2f} с, скорость: {args.rows / elapsed:,.0f} строк/с")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Сравнение загрузки клиентов в объекты: прежний путь Client(**dict(row)) с объектами
+со словарём атрибутов и новый — модели со __slots__, построенные из кортежей курсора.
+
+Запуск из корня проекта:
+    python benchmarks/bench_models.py --rows 1000000
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from models import Client  # noqa: E402
+
+
+class LegacyClient:
+    """Прежний Client: обычный класс со словарём атрибутов."""
+
+    def __init__(self, name, email, phone, address, id=None, city=None):
+        self.id = id
+        self.name = name
+        self._email = email
+        self.phone = phone
+        self.address = address
+        self.city = city
+
+
+def legacy_load():
+    cursor = db.get_connection().cursor()
+    cursor.row_factory = sqlite3.Row
+    cursor.execute("SELECT id, name, email, phone, address, city FROM clients;")
+    return [LegacyClient(**dict(row)) for row in cursor.fetchall()]
+
+
+def fill_clients(rows):
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO clients (name, email, phone, address, city) VALUES (?, ?, ?, ?, ?)",
+            ((f"Клиент {i}", f"client{i}@example.com", "+79000000000", "Москва", "Москва") for i in range(rows))
+        )
+
+
+def object_overhead(make):
+    """Сколько байт занимает один объект модели сверх значений его полей (значения общие)."""
+    values = ("Клиент", "client@example.com", "+79000000000", "Москва")
+    tracemalloc.start()
+    objects = [make(*values, id=1, city="Москва") for _ in range(100_000)]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size / len(objects)
+
+
+def measure(label, func, rows):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    objects = func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>8}: {elapsed:6.2f} с ({rows / elapsed:,.0f} строк/с), пик памяти {peak / 2 ** 20:7.1f} МБ")
+    return objects
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000, help="количество клиентов в базе")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db.DB_FILE = os.path.join(tmp_dir, "bench_shop.db")
+        db.create_tables()
+        fill_clients(args.rows)
+        print(f"Клиентов в базе: {args.rows}")
+        measure("прежний", legacy_load, args.rows)
+        clients = measure("слоты", db.get_all_clients, args.rows)
+        assert isinstance(clients[0], Client)
+        print(f"Объект без значений полей: прежний {object_overhead(LegacyClient):.0f} байт, "
+              f"слоты {object_overhead(Client):.0f} байт")
+        db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Сравнение загрузки заказов в DataFrame: прежний путь через объекты Order и новый столбцовый.
+
+Запуск из корня проекта:
+    python benchmarks/bench_orders_df.py --orders 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import analysis  # noqa: E402
+import db  # noqa: E402
+
+
+def legacy_get_orders_df():
+    """Прежняя реализация: строка -> Order -> dict -> DataFrame и разбор дат без формата."""
+    orders_data = db.get_all_orders()
+    data = [{
+        'id': order.id,
+        'client_name': order.client_name,
+        'order_date': order.order_date,
+        'total_cost': order.total_cost
+    } for order in orders_data]
+    df = pd.DataFrame(data)
+    df['order_date'] = pd.to_datetime(df['order_date'])
+    return df
+
+
+def fill_orders(orders, clients=1000):
+    rnd = random.Random(1)
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)",
+            ((f"Клиент {i}", f"client{i}@example.com", "+79000000000", "Москва") for i in range(clients))
+        )
+        conn.executemany(
+            "INSERT INTO orders (client_id, order_date, total_cost) VALUES (?, ?, ?)",
+            ((rnd.randint(1, clients),
+              f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d} {rnd.randint(0, 23):02d}:00:00",
+              rnd.uniform(100, 10000)) for _ in range(orders))
+        )
+
+
+def measure(label, func):
+    tracemalloc.start()
+    start = time.perf_counter()
+    df = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = df.memory_usage(deep=True).sum()
+    print(f"{label:>10}: {elapsed:6.2f} с, пик памяти {peak / 2 ** 20:8.1f} МБ, DataFrame {size / 2 ** 20:7.1f} МБ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--orders", type=int, default=1_000_000, help="количество заказов в базе")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db.DB_FILE = os.path.join(tmp_dir, "bench_shop.db")
+        db.create_tables()
+        fill_orders(args.orders)
+        print(f"Заказов в базе: {args.orders}")
+        measure("прежний", legacy_get_orders_df)
+        measure("столбцовый", analysis.get_orders_df)
+        db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
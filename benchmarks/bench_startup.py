@@ -0,0 +1,127 @@
+"""Время запуска приложения: импорт gui (по python -X importtime) и время до первого окна.
+
+Каждый замер выполняется в отдельном процессе интерпретатора; берётся медиана по
+нескольким запускам. Если медиана превышает бюджет, скрипт завершается с кодом 1,
+поэтому его можно запускать в CI и отслеживать регресс запуска. Без дисплея замер
+окна пропускается.
+
+Запуск из корня проекта:
+    python benchmarks/bench_startup.py --runs 5
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Бюджеты запуска, мс
+IMPORT_BUDGET_MS = 250
+WINDOW_BUDGET_MS = 1500
+
+# Модули, которые не должны загружаться до первого показа вкладки анализа
+HEAVY_MODULES = ("analysis", "pandas", "matplotlib", "networkx", "numpy", "seaborn")
+
+# Дочерний процесс: создаёт окно, дожидается его отрисовки и первой вкладки и сообщает время
+WINDOW_SCRIPT = """
+import sys, time
+import db
+db.DB_FILE = sys.argv[1]
+db.migrate()
+from gui import App
+app = App()
+app.update()
+print(f"ready {time.perf_counter()}", flush=True)
+heavy = sorted(name for name in sys.argv[2].split(",") if name in sys.modules)
+print("heavy " + ",".join(heavy), flush=True)
+app.on_close()
+db.close_connections()
+"""
+
+
+def parse_importtime(stderr):
+    """Разбирает вывод -X importtime: {модуль: (собственное время, накопленное время) в мкс}."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def measure_import():
+    """Один запуск python -X importtime -c 'import gui': (время импорта gui в мс, {модуль: времена})."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import gui"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    modules = parse_importtime(result.stderr)
+    return modules["gui"][1] / 1000, modules
+
+
+def measure_window(db_file):
+    """Один запуск приложения: (мс от старта процесса до отрисовки окна, загруженные тяжёлые модули).
+
+    Возвращает None, если окно создать нельзя (нет дисплея).
+    """
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", WINDOW_SCRIPT, db_file, ",".join(HEAVY_MODULES)],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        if "TclError" in result.stderr:
+            return None
+        raise RuntimeError(result.stderr)
+    lines = dict(line.split(" ", 1) for line in result.stdout.splitlines() if " " in line)
+    # perf_counter в Linux — общие для процессов монотонные часы
+    elapsed = (float(lines["ready"]) - start) * 1000
+    return elapsed, [name for name in lines.get("heavy", "").split(",") if name]
+
+
+def check(label, value, budget):
+    status = "в бюджете" if value <= budget else "ПРЕВЫШЕН БЮДЖЕТ"
+    print(f"{label}: {value:7.1f} мс (бюджет {budget} мс) — {status}")
+    return value <= budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="число запусков для медианы")
+    parser.add_argument("--db", default=None, help="база для замера окна (по умолчанию — пустая временная)")
+    parser.add_argument("--import-budget", type=float, default=IMPORT_BUDGET_MS, help="бюджет импорта gui, мс")
+    parser.add_argument("--window-budget", type=float, default=WINDOW_BUDGET_MS, help="бюджет до первого окна, мс")
+    parser.add_argument("--top", type=int, default=10, help="сколько самых долгих импортов показать")
+    args = parser.parse_args()
+
+    ok = True
+    samples, modules = [], {}
+    for _ in range(args.runs):
+        elapsed, modules = measure_import()
+        samples.append(elapsed)
+    heavy = [name for name in HEAVY_MODULES if name in modules]
+    print("Самые долгие импорты (собственное время, мс):")
+    for name, (own, _) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"  {own / 1000:7.1f}  {name}")
+    if heavy:
+        print(f"При импорте gui загружены тяжёлые модули: {', '.join(heavy)}")
+        ok = False
+    ok &= check("Импорт gui (медиана)", statistics.median(samples), args.import_budget)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = args.db or os.path.join(tmp_dir, "bench_shop.db")
+        windows = [measure_window(db_file) for _ in range(args.runs)]
+    if None in windows:
+        print("Нет дисплея: замер времени до первого окна пропущен")
+    else:
+        loaded = sorted({name for _, names in windows for name in names})
+        if loaded:
+            print(f"До первого окна загружены тяжёлые модули: {', '.join(loaded)}")
+            ok = False
+        ok &= check("До первого окна (медиана)", statistics.median(elapsed for elapsed, _ in windows),
+                    args.window_budget)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+"""Набор замеров производительности на синтетических данных разного масштаба с базовой линией.
+
+Для каждого масштаба N (по умолчанию 10 тыс., 100 тыс. и 1 млн) генерируется база с N
+клиентами, N заказами и N / 100 товарами (см. generate_data.py), и на ней замеряются
+выгрузки db.get_all_*, добавление заказов, импорт CSV, экспорт JSON, загрузка заказов
+в DataFrame, топ клиентов и построение графиков. Каждый замер повторяется несколько
+раз, в результат идёт лучшее время (оно меньше всего зависит от фоновой нагрузки);
+время подготовки данных не учитывается.
+
+Результаты сравниваются с сохранённой базовой линией (baseline.json рядом со скриптом):
+замер, ставший медленнее более чем на допуск, считается регрессом, и скрипт завершается
+с кодом 1. Базовая линия зависит от машины, её сохраняют ключом --save.
+
+Запуск из корня проекта:
+    python benchmarks/bench_suite.py --scales 10000 100000 --save
+    python benchmarks/bench_suite.py --scales 10000 100000 --cases db.get_all_clients analysis.get_orders_df
+    python benchmarks/bench_suite.py --data-dir /tmp/shop-bench    # базы сохраняются между запусками
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+import analysis  # noqa: E402
+import db  # noqa: E402
+from generate_data import generate  # noqa: E402
+from models import Order  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+SCALES = (10_000, 100_000, 1_000_000)
+# Замер медленнее базовой линии больше чем на TOLERANCE (доля) и на NOISE_FLOOR секунд — регресс
+TOLERANCE = 0.5
+NOISE_FLOOR = 0.02
+# Сколько заказов добавляется через db.add_order за один замер
+ADD_ORDERS = 200
+
+# Имя замера -> функция подготовки. Она вызывается перед каждым повтором (не замеряется)
+# и возвращает функцию, время выполнения которой замеряется. Замеры, меняющие данные,
+# идут в конце списка, чтобы не влиять на остальные.
+CASES = {}
+
+
+def case(name):
+    def register(prepare):
+        CASES[name] = prepare
+        return prepare
+    return register
+
+
+@case("db.get_all_clients")
+def _get_all_clients(env):
+    return db.get_all_clients
+
+
+@case("db.get_all_products")
+def _get_all_products(env):
+    return db.get_all_products
+
+
+@case("db.get_all_orders")
+def _get_all_orders(env):
+    return db.get_all_orders
+
+
+@case("analysis.get_orders_df")
+def _get_orders_df(env):
+    return analysis.get_orders_df
+
+
+@case("analysis.get_top_clients")
+def _get_top_clients(env):
+    return analysis.get_top_clients
+
+
+@case("analysis.plot_order_dynamics")
+def _plot_order_dynamics(env):
+    def run():
+        fig = analysis.plot_order_dynamics(fig=Figure(figsize=(10, 6)))
+        FigureCanvasAgg(fig).draw()
+    return run
+
+
+@case("analysis.plot_client_geography_graph")
+def _plot_client_geography(env):
+    def run():
+        fig = analysis.plot_client_geography_graph(fig=Figure(figsize=(10, 8)))
+        FigureCanvasAgg(fig).draw()
+    return run
+
+
+@case("db.export_data_to_json")
+def _export_data_to_json(env):
+    path = os.path.join(env["tmp_dir"], "export.json")
+    if os.path.exists(path):
+        os.remove(path)
+    return lambda: db.export_data_to_json(path)
+
+
+@case("db.add_order")
+def _add_order(env):
+    client_id = db.get_last_id("clients")
+    product_ids = [1, max(db.get_last_id("products") // 2, 1)]
+
+    def run():
+        for i in range(ADD_ORDERS):
+            db.add_order(Order(None, client_id - i % 100, [], "2025-12-31 12:00:00",
+                               lines=[(product_ids[i % 2], 1 + i % 3)]))
+    return run
+
+
+@case("db.import_data_from_csv")
+def _import_data_from_csv(env):
+    # Каждый повтор импортирует N / 10 новых клиентов с ещё не занятыми email
+    env["imports"] = env.get("imports", 0) + 1
+    rows = max(env["scale"] // 10, 1)
+    path = os.path.join(env["tmp_dir"], "clients.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "email", "phone", "address"])
+        for i in range(rows):
+            writer.writerow([f"Клиент {i}", f"import{env['imports']}-{i}@example.com", "+79001234567",
+                             "Казань, ул. Баумана, д. 1"])
+    return lambda: db.import_data_from_csv(path)
+
+
+def prepare_database(scale, data_dir, tmp_dir, seed):
+    """Возвращает путь к рабочей копии базы масштаба scale.
+
+    Если задан data_dir, сгенерированная база хранится там и при следующих запусках
+    только копируется (замеры меняют рабочую копию, а не сохранённую базу).
+    """
+    work_file = os.path.join(tmp_dir, f"bench_{scale}.db")
+    source = os.path.join(data_dir, f"shop_{scale}_seed{seed}.db") if data_dir else work_file
+    if not os.path.exists(source):
+        start = time.perf_counter()
+        db.DB_FILE = source
+        generate(clients=scale, products=max(scale // 100, 100), orders=scale, seed=seed)
+        db.close_connections()
+        print(f"  база сгенерирована за {time.perf_counter() - start:.1f} с")
+    if source != work_file:
+        shutil.copyfile(source, work_file)
+    return work_file
+
+
+def run_scale(scale, names, repeats, data_dir, seed):
+    """Выполняет замеры names на базе масштаба scale: {имя: лучшее время в секундах}."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db.DB_FILE = prepare_database(scale, data_dir, tmp_dir, seed)
+        db.migrate()
+        env = {"scale": scale, "tmp_dir": tmp_dir}
+        for name in names:
+            samples = []
+            for _ in range(repeats):
+                run = CASES[name](env)
+                start = time.perf_counter()
+                run()
+                samples.append(time.perf_counter() - start)
+            results[name] = min(samples)
+        db.close_connections()
+    return results
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, baseline, results):
+    """Дописывает результаты в базовую линию: масштабы и замеры, которых не было в этом запуске, сохраняются."""
+    scales = baseline.setdefault("results", {})
+    for scale, timings in results.items():
+        scales.setdefault(str(scale), {}).update((name, round(elapsed, 4)) for name, elapsed in timings.items())
+    baseline["python"] = platform.python_version()
+    baseline["machine"] = f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPU"
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def report(scale, results, baseline, tolerance):
+    """Печатает замеры масштаба scale рядом с базовой линией; возвращает имена регрессировавших замеров."""
+    base = baseline.get("results", {}).get(str(scale), {})
+    regressions = []
+    print(f"{'замер':>38} {'время, с':>10} {'база, с':>10} {'изменение':>10}")
+    for name, elapsed in results.items():
+        if name in base:
+            change = elapsed / base[name] - 1 if base[name] else 0.0
+            regressed = change > tolerance and elapsed - base[name] > NOISE_FLOOR
+            mark = "  РЕГРЕСС" if regressed else ""
+            print(f"{name:>38} {elapsed:10.3f} {base[name]:10.3f} {change:+10.0%}{mark}")
+            if regressed:
+                regressions.append(name)
+        else:
+            print(f"{name:>38} {elapsed:10.3f} {'—':>10}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=list(SCALES), help="масштабы (клиентов и заказов)")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES), metavar="ЗАМЕР",
+                        help="какие замеры выполнить: " + ", ".join(CASES))
+    parser.add_argument("--repeats", type=int, default=5, help="сколько раз повторять каждый замер")
+    parser.add_argument("--data-dir", default=None, help="каталог для сгенерированных баз (переиспользуются)")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора данных")
+    parser.add_argument("--baseline", default=BASELINE_FILE, help="файл базовой линии")
+    parser.add_argument("--save", action="store_true", help="записать результаты в базовую линию")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="допустимое замедление (доля)")
+    args = parser.parse_args()
+
+    if args.data_dir:
+        os.makedirs(args.data_dir, exist_ok=True)
+    # Замеры выполняются в порядке CASES: меняющие данные — последними
+    names = [name for name in CASES if name in args.cases]
+    baseline = load_baseline(args.baseline)
+    all_results, regressions = {}, []
+    for scale in args.scales:
+        print(f"Масштаб {scale}:")
+        all_results[scale] = run_scale(scale, names, args.repeats, args.data_dir, args.seed)
+        regressions += [f"{name} ({scale})" for name in report(scale, all_results[scale], baseline, args.tolerance)]
+
+    if args.save:
+        save_baseline(args.baseline, baseline, all_results)
+        print(f"Базовая линия сохранена: {args.baseline}")
+    elif regressions:
+        print(f"Регресс относительно базовой линии: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+"""Генератор синтетических данных магазина: клиенты, товары и заказы в нужном количестве.
+
+Города клиентов выбираются с весами, близкими к численности населения, а адреса пишутся
+в разных распространённых форматах ("Казань, ул. ...", "Казань г., ...", "г. Казань, ...",
+с областью или индексом впереди, без города), поэтому extract_city и география клиентов
+работают на реалистичном распределении, в том числе с неразобранными адресами.
+Данные детерминированы: одинаковые параметры и seed дают одинаковую базу.
+
+Запуск из корня проекта (данные добавляются к уже имеющимся):
+    python benchmarks/generate_data.py --db shop.db --clients 100000 --products 1000 --orders 200000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from models import extract_city  # noqa: E402
+
+# Город, область и вес (население, тыс. человек)
+CITIES = (
+    ("Москва", "Московская область", 13100),
+    ("Санкт-Петербург", "Ленинградская область", 5600),
+    ("Новосибирск", "Новосибирская область", 1630),
+    ("Екатеринбург", "Свердловская область", 1540),
+    ("Казань", "Республика Татарстан", 1320),
+    ("Нижний Новгород", "Нижегородская область", 1210),
+    ("Красноярск", "Красноярский край", 1190),
+    ("Челябинск", "Челябинская область", 1180),
+    ("Самара", "Самарская область", 1160),
+    ("Уфа", "Республика Башкортостан", 1160),
+    ("Ростов-на-Дону", "Ростовская область", 1140),
+    ("Краснодар", "Краснодарский край", 1100),
+    ("Омск", "Омская область", 1110),
+    ("Воронеж", "Воронежская область", 1050),
+    ("Пермь", "Пермский край", 1030),
+    ("Волгоград", "Волгоградская область", 1020),
+    ("Саратов", "Саратовская область", 900),
+    ("Тюмень", "Тюменская область", 850),
+    ("Тольятти", "Самарская область", 680),
+    ("Ижевск", "Удмуртская Республика", 630),
+    ("Барнаул", "Алтайский край", 630),
+    ("Иркутск", "Иркутская область", 610),
+    ("Хабаровск", "Хабаровский край", 610),
+    ("Ярославль", "Ярославская область", 570),
+    ("Владивосток", "Приморский край", 600),
+    ("Томск", "Томская область", 570),
+    ("Оренбург", "Оренбургская область", 550),
+    ("Кемерово", "Кемеровская область", 540),
+    ("Рязань", "Рязанская область", 520),
+    ("Калининград", "Калининградская область", 490),
+    ("Тула", "Тульская область", 470),
+    ("Сочи", "Краснодарский край", 450),
+    ("Курск", "Курская область", 440),
+    ("Тверь", "Тверская область", 420),
+    ("Архангельск", "Архангельская область", 300),
+    ("Мурманск", "Мурманская область", 270),
+    ("Петрозаводск", "Республика Карелия", 280),
+    ("Якутск", "Республика Саха", 360),
+)
+
+STREETS = (
+    "ул. Ленина", "ул. Гагарина", "ул. Пушкина", "Советская улица", "пр. Мира", "Садовая ул.",
+    "ул. Мира", "Набережная ул.", "пер. Почтовый", "ул. Кирова", "Комсомольский проспект",
+    "ул. Победы", "ул. Лесная", "ул. Молодёжная", "Центральная улица",
+)
+
+# Шаблон адреса и его вес: большинство адресов начинаются с города, но встречаются и другие записи
+ADDRESS_FORMATS = (
+    ("{city}, {street}, д. {house}", 40),
+    ("{city} г., {street}, дом {house}", 15),
+    ("г. {city}, {street}, д. {house}, кв. {flat}", 15),
+    ("{region}, {city}, {street}, д. {house}", 15),
+    ("{index}, {city}, {street}, {house}", 10),
+    ("{street}, д. {house}", 3),
+    ("", 2),
+)
+
+FIRST_NAMES = (
+    "Александр", "Алексей", "Андрей", "Дмитрий", "Иван", "Максим", "Михаил", "Сергей", "Артём", "Никита",
+    "Анна", "Елена", "Мария", "Ольга", "Наталья", "Татьяна", "Екатерина", "Ирина", "Дарья", "Светлана",
+)
+LAST_NAMES = (
+    "Иванов", "Смирнов", "Кузнецов", "Попов", "Васильев", "Петров", "Соколов", "Михайлов", "Новиков",
+    "Фёдоров", "Морозов", "Волков", "Алексеев", "Лебедев", "Семёнов", "Егоров", "Павлов", "Козлов",
+)
+EMAIL_DOMAINS = ("example.com", "mail.example.ru", "inbox.example.ru", "corp.example.org")
+
+PRODUCT_KINDS = (
+    "Ноутбук", "Смартфон", "Планшет", "Монитор", "Клавиатура", "Мышь", "Наушники", "Кабель", "Зарядка",
+    "Колонка", "Роутер", "Принтер", "Флешка", "SSD-диск", "Веб-камера", "Микрофон", "Чехол", "Часы",
+)
+PRODUCT_BRANDS = ("Альфа", "Вектор", "Горизонт", "Орбита", "Полюс", "Спектр", "Титан", "Зенит")
+
+# Сколько строк вставляется за одну транзакцию
+GENERATE_BATCH_SIZE = 50_000
+
+# Период, на который распределяются даты заказов
+ORDERS_START = datetime(2024, 1, 1)
+ORDERS_DAYS = 730
+
+
+def _is_female(first_name):
+    return first_name.endswith("а") or first_name.endswith("я")
+
+
+def make_address(rnd, city_weights, format_weights):
+    """Случайный адрес: город по весам населения, формат записи — по весам ADDRESS_FORMATS."""
+    city, region, _ = rnd.choices(CITIES, cum_weights=city_weights)[0]
+    template = rnd.choices(ADDRESS_FORMATS, cum_weights=format_weights)[0][0]
+    return template.format(city=city, region=region, street=rnd.choice(STREETS), house=rnd.randint(1, 150),
+                           flat=rnd.randint(1, 300), index=rnd.randint(100000, 699999))
+
+
+def _cumulative(weights):
+    total, result = 0, []
+    for weight in weights:
+        total += weight
+        result.append(total)
+    return result
+
+
+def client_rows(rnd, start_id, count):
+    """Строки clients (id, name, email, phone, address, city)."""
+    city_weights = _cumulative(weight for _, _, weight in CITIES)
+    format_weights = _cumulative(weight for _, weight in ADDRESS_FORMATS)
+    for client_id in range(start_id, start_id + count):
+        first_name = rnd.choice(FIRST_NAMES)
+        last_name = rnd.choice(LAST_NAMES) + ("а" if _is_female(first_name) else "")
+        address = make_address(rnd, city_weights, format_weights)
+        yield (client_id, f"{first_name} {last_name}", f"client{client_id}@{rnd.choice(EMAIL_DOMAINS)}",
+               f"+79{rnd.randint(0, 999_999_999):09d}", address, extract_city(address))
+
+
+def product_rows(rnd, start_id, count):
+    """Строки products (id, name, price); цены распределены логнормально (от сотен до сотен тысяч)."""
+    for product_id in range(start_id, start_id + count):
+        name = f"{rnd.choice(PRODUCT_KINDS)} {rnd.choice(PRODUCT_BRANDS)} {product_id}"
+        yield product_id, name, round(min(rnd.lognormvariate(7.5, 1.2), 500_000), 2)
+
+
+def order_rows(rnd, start_id, count, clients, products):
+    """Пары (строка orders, строки order_products) с уже посчитанными итогами заказа.
+
+    clients — список (id, имя) клиентов, products — список (id, название, цена). Часть клиентов
+    покупает заметно чаще остальных, в заказе от одного до пяти разных товаров.
+    """
+    for order_id in range(start_id, start_id + count):
+        client_id, client_name = clients[int(len(clients) * rnd.random() ** 2)]
+        moment = ORDERS_START + timedelta(days=rnd.randrange(ORDERS_DAYS), seconds=rnd.randrange(9 * 3600, 23 * 3600))
+        lines = []
+        for product_id, name, price in rnd.sample(products, min(rnd.randint(1, 5), len(products))):
+            lines.append((order_id, product_id, rnd.choices((1, 2, 3, 5), weights=(70, 20, 7, 3))[0], price, name))
+        total = sum(quantity * price for _, _, quantity, price, _ in lines)
+        items = sum(quantity for _, _, quantity, _, _ in lines)
+        summary = ",".join(f"{name}: {quantity}" for _, _, quantity, _, name in lines)
+        yield ((order_id, client_id, client_name, moment.strftime("%Y-%m-%d %H:%M:%S"), total, items, summary),
+               [line[:4] for line in lines])
+
+
+def _insert_batches(conn, query, rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            with conn:
+                conn.executemany(query, batch)
+            batch = []
+    if batch:
+        with conn:
+            conn.executemany(query, batch)
+
+
+def _write_orders(conn, orders, lines):
+    with conn:
+        conn.executemany("""INSERT INTO orders (id, client_id, client_name, order_date, total_cost, items_count,
+                                                items_summary)
+                            VALUES (?, ?, ?, ?, ?, ?, ?)""", orders)
+        conn.executemany("INSERT INTO order_products (order_id, product_id, quantity, price) VALUES (?, ?, ?, ?)",
+                         lines)
+
+
+def generate(clients=1000, products=100, orders=1000, seed=1, batch_size=GENERATE_BATCH_SIZE):
+    """Добавляет в базу db.DB_FILE clients клиентов, products товаров и orders заказов.
+
+    Схема создаётся или обновляется миграциями; строки вставляются пачками напрямую,
+    итоги заказов считаются при генерации. После вставки новые строки добавляются в
+    индексы поиска, а кэш аналитики досчитывается.
+    """
+    rnd = random.Random(seed)
+    db.migrate()
+    # Строки вставляются без построчной индексации для поиска, индексы дозаполняются в конце
+    db.defer_search_indexing()
+    conn = db.get_connection()
+    next_client = db.get_last_id("clients") + 1
+    next_product = db.get_last_id("products") + 1
+    next_order = db.get_last_id("orders") + 1
+
+    _insert_batches(conn, "INSERT INTO clients (id, name, email, phone, address, city) VALUES (?, ?, ?, ?, ?, ?)",
+                    client_rows(rnd, next_client, clients), batch_size)
+    _insert_batches(conn, "INSERT INTO products (id, name, price) VALUES (?, ?, ?)",
+                    product_rows(rnd, next_product, products), batch_size)
+
+    if orders:
+        client_list = [tuple(row) for row in conn.execute("SELECT id, name FROM clients ORDER BY id;")]
+        product_list = [tuple(row) for row in conn.execute("SELECT id, name, price FROM products ORDER BY id;")]
+        if not client_list or not product_list:
+            raise ValueError("Для заказов нужны клиенты и товары.")
+        pending_orders, pending_lines = [], []
+        for order, lines in order_rows(rnd, next_order, orders, client_list, product_list):
+            pending_orders.append(order)
+            pending_lines.extend(lines)
+            if len(pending_orders) >= batch_size:
+                _write_orders(conn, pending_orders, pending_lines)
+                pending_orders, pending_lines = [], []
+        if pending_orders:
+            _write_orders(conn, pending_orders, pending_lines)
+
+    db.backfill_search_indexes(batch_size)
+    db.get_catalog().invalidate()
+    db.refresh_analytics()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=db.DB_FILE, help="файл базы данных")
+    parser.add_argument("--clients", type=int, default=10_000, help="сколько клиентов добавить")
+    parser.add_argument("--products", type=int, default=500, help="сколько товаров добавить")
+    parser.add_argument("--orders", type=int, default=20_000, help="сколько заказов добавить")
+    parser.add_argument("--seed", type=int, default=1, help="зерно генератора случайных чисел")
+    args = parser.parse_args()
+
+    db.DB_FILE = args.db
+    start = time.perf_counter()
+    generate(args.clients, args.products, args.orders, args.seed)
+    print(f"Добавлено клиентов: {args.clients}, товаров: {args.products}, заказов: {args.orders} "
+          f"за {time.perf_counter() - start:.1f} с ({args.db})")
+    db.close_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,55 +1,468 @@
 import sqlite3
 import json
+import re
+import os
 import csv
-from models import Client, Product, Order
+import gzip
+import queue
+import threading
+from operator import itemgetter
+from models import Client, Product, Order, extract_city, validate_clients
 
 DB_FILE = "shop.db"
 
+# Сколько простаивающих соединений пул держит открытыми для повторного использования
+POOL_SIZE = 8
+
+# Настройки SQLite, которые применяются один раз при открытии соединения
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",       # читатели не блокируют писателя
+    "PRAGMA synchronous=NORMAL",     # в режиме WAL это безопасно и намного быстрее FULL
+    "PRAGMA cache_size=-65536",      # 64 МБ страничного кэша на соединение
+    "PRAGMA mmap_size=268435456",    # 256 МБ файла отображаются в память
+    "PRAGMA temp_store=MEMORY",      # временные таблицы и сортировки в памяти
+)
+
+
+class ConnectionPool:
+    """Пул долгоживущих соединений с базой данных.
+
+    Каждому потоку выдаётся своё соединение, которое живёт до вызова release().
+    Освобождённые соединения складываются в ограниченный пул и переиспользуются
+    другими потоками, поэтому открытие файла и настройка PRAGMA выполняются редко.
+    """
+
+    def __init__(self, db_file, max_idle=POOL_SIZE):
+        self.db_file = db_file
+        self.max_idle = max_idle
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._opened = []
+
+    def _open(self):
+        """Открывает новое соединение и настраивает его."""
+        conn = sqlite3.connect(self.db_file, timeout=30, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            self._opened.append(conn)
+        return conn
+
+    def acquire(self):
+        """Возвращает соединение текущего потока, при необходимости беря его из пула."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            self._local.conn = conn
+        return conn
+
+    def release(self):
+        """Возвращает соединение текущего потока в пул (или закрывает его, если пул полон)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            return
+        self._local.conn = None
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() < self.max_idle:
+            self._idle.put(conn)
+        else:
+            with self._lock:
+                self._opened.remove(conn)
+            conn.close()
+
+    def close_all(self):
+        """Закрывает все соединения, открытые пулом."""
+        with self._lock:
+            opened, self._opened = self._opened, []
+        for conn in opened:
+            conn.close()
+        self._idle = queue.LifoQueue()
+        self._local = threading.local()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Возвращает пул соединений для текущего DB_FILE."""
+    global _pool
+    pool = _pool
+    if pool is None or pool.db_file != DB_FILE:
+        with _pool_lock:
+            if _pool is None or _pool.db_file != DB_FILE:
+                if _pool is not None:
+                    _pool.close_all()
+                _pool = ConnectionPool(DB_FILE)
+            pool = _pool
+    return pool
+
 
 def get_connection():
-    """Возвращает соединение с базой данных."""
-    return sqlite3.connect(DB_FILE)
+    """Возвращает соединение с базой данных.
+
+    Соединение принадлежит текущему потоку и не закрывается после использования:
+    конструкция ``with get_connection() as conn`` лишь фиксирует или откатывает транзакцию.
+    """
+    return get_pool().acquire()
+
+
+def release_connection():
+    """Возвращает соединение текущего потока в пул. Вызывается фоновыми потоками по завершении работы."""
+    if _pool is not None:
+        _pool.release()
+
+
+def close_connections():
+    """Закрывает все открытые соединения (при выходе из приложения и в тестах)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+            _pool = None
+
+
+def _create_base_schema(conn):
+    """Миграция 1: исходные таблицы магазина."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS clients (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT NOT NULL UNIQUE,
+            phone TEXT NOT NULL,
+            address TEXT
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            price REAL NOT NULL
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS orders (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            client_id INTEGER,
+            order_date TEXT NOT NULL,
+            FOREIGN KEY (client_id) REFERENCES clients(id)
+        );
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS order_products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            order_id INTEGER,
+            product_id INTEGER,
+            quantity INTEGER DEFAULT 1,
+            FOREIGN KEY (order_id) REFERENCES orders(id),
+            FOREIGN KEY (product_id) REFERENCES products(id)
+        );
+    """)
+
+
+# Пересчёт сохранённых итогов заказа по его позициям (цены берутся из снимка в order_products)
+_UPDATE_ORDER_TOTALS = """
+    UPDATE orders SET
+        total_cost = (SELECT COALESCE(SUM(op.price * op.quantity), 0)
+                        FROM order_products op WHERE op.order_id = orders.id),
+        items_count = (SELECT COALESCE(SUM(op.quantity), 0)
+                         FROM order_products op WHERE op.order_id = orders.id),
+        items_summary = (SELECT COALESCE(GROUP_CONCAT(p.name || ': ' || op.quantity), '')
+                           FROM order_products op JOIN products p ON op.product_id = p.id
+                          WHERE op.order_id = orders.id)
+"""
+
+
+def _column_exists(conn, table, column):
+    return any(row[1] == column for row in conn.execute(f"PRAGMA table_info({table});"))
+
+
+def _materialize_order_totals(conn):
+    """Миграция 2: сохранённые итоги заказов и цена товара в позиции.
+
+    Для уже существующих заказов цена позиции фиксируется по текущей цене товара.
+    """
+    # Без индекса каждый подзапрос _UPDATE_ORDER_TOTALS перебирает все позиции всех заказов
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_products_order_id ON order_products(order_id);")
+    if not _column_exists(conn, "order_products", "price"):
+        conn.execute("ALTER TABLE order_products ADD COLUMN price REAL;")
+        conn.execute("""
+            UPDATE order_products
+               SET price = (SELECT p.price FROM products p WHERE p.id = order_products.product_id);
+        """)
+    if not _column_exists(conn, "orders", "total_cost"):
+        conn.execute("ALTER TABLE orders ADD COLUMN total_cost REAL NOT NULL DEFAULT 0;")
+        conn.execute("ALTER TABLE orders ADD COLUMN items_count INTEGER NOT NULL DEFAULT 0;")
+        conn.execute("ALTER TABLE orders ADD COLUMN items_summary TEXT NOT NULL DEFAULT '';")
+        conn.execute(_UPDATE_ORDER_TOTALS + ";")
+
+
+def _create_page_indexes(conn):
+    """Миграция 3: индексы под столбцы сортировки постраничного API (get_*_page)."""
+    for index_sql in PAGE_INDEXES:
+        conn.execute(index_sql)
+
+
+def _create_foreign_key_indexes(conn):
+    """Миграция 4: индексы внешних ключей для соединений и выборок по клиенту и заказу."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_products_order_id ON order_products(order_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_order_products_product_id ON order_products(product_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_client_id ON orders(client_id);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_order_date ON orders(order_date);")
+
+
+def _create_analytics_indexes(conn):
+    """Миграция 5: покрывающие индексы для агрегатов по клиентам и датам (таблица orders не читается)."""
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_client_total ON orders(client_id, total_cost);")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_date_total ON orders(order_date, total_cost);")
+
+
+def _create_analytics_cache(conn):
+    """Миграция 6: таблицы инкрементального кэша аналитики (см. refresh_analytics).
+
+    Кэш заполняется при первом обращении к аналитике, а не здесь, чтобы обновление
+    схемы большой базы не задерживало запуск приложения.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_daily (
+            day TEXT PRIMARY KEY,
+            revenue REAL NOT NULL DEFAULT 0,
+            orders_count INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID;
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_clients (
+            client_id INTEGER PRIMARY KEY,
+            total REAL NOT NULL DEFAULT 0,
+            orders_count INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_analytics_clients_total ON analytics_clients(total);")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS analytics_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            last_order_id INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    conn.execute("INSERT OR IGNORE INTO analytics_state (id, last_order_id) VALUES (1, 0);")
+
+
+def _add_client_city(conn):
+    """Миграция 7: город клиента в отдельном индексируемом столбце clients.city.
+
+    Существующие строки заполняются не здесь, а функцией backfill_client_cities,
+    чтобы разбор адресов большой базы не задерживал запуск приложения.
+    """
+    if not _column_exists(conn, "clients", "city"):
+        conn.execute("ALTER TABLE clients ADD COLUMN city TEXT;")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_clients_city ON clients(city);")
+
+
+# Полнотекстовые индексы: таблица FTS5 -> (таблица с данными, индексируемые столбцы).
+# FTS5 хранит только индекс (content=...), сами строки читаются из основной таблицы.
+FTS_TABLES = {
+    "clients_fts": ("clients", ("name", "email", "phone")),
+    "products_fts": ("products", ("name",)),
+    "orders_fts": ("orders", ("items_summary",)),
+}
+
+
+def _create_search_state(conn):
+    """Таблица состояния полнотекстовых индексов: до какого id строки таблицы уже в индексе.
+
+    last_id = NULL — индекс полный, его поддерживают триггеры; число — строки с большим
+    id ещё ждут backfill_search_indexes.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS search_index_state (
+            fts_table TEXT PRIMARY KEY,
+            last_id INTEGER
+        ) WITHOUT ROWID;
+    """)
+
+
+def _create_fts_table(conn, fts_table):
+    """Создаёт индекс FTS5 над таблицей и триггеры, которые поддерживают его при изменении строк.
+
+    Индекс создаётся пустым: строки, которые уже есть в таблице, добавляет в него
+    backfill_search_indexes, чтобы обновление схемы большой базы не задерживало запуск
+    приложения. Триггеры не трогают строки, которые ещё не попали в индекс: удаление из
+    FTS5 строки, которой там нет, повреждает индекс.
+    """
+    table, columns = FTS_TABLES[fts_table]
+    column_list = ", ".join(columns)
+    _create_search_state(conn)
+    conn.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts_table} USING fts5(
+            {column_list}, content='{table}', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+        );
+    """)
+    # Индекс пустой таблицы сразу полный, иначе его дозаполнит backfill_search_indexes
+    conn.execute(f"""
+        INSERT OR IGNORE INTO search_index_state (fts_table, last_id)
+        SELECT ?, CASE WHEN EXISTS (SELECT 1 FROM {table}) THEN 0 END;
+    """, (fts_table,))
+    _create_fts_triggers(conn, fts_table)
+
+
+def _create_fts_triggers(conn, fts_table):
+    """Создаёт недостающие триггеры, которые поддерживают индекс fts_table при изменении строк."""
+    table, columns = FTS_TABLES[fts_table]
+    column_list = ", ".join(columns)
+    new_values = ", ".join(f"new.{column}" for column in columns)
+    old_values = ", ".join(f"old.{column}" for column in columns)
+    # Строка в индексе, если он полный или уже дозаполнен до её id
+    last_id = f"(SELECT last_id FROM search_index_state WHERE fts_table = '{fts_table}')"
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ai AFTER INSERT ON {table}
+        WHEN IFNULL(new.id <= {last_id}, 1) BEGIN
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_ad AFTER DELETE ON {table}
+        WHEN IFNULL(old.id <= {last_id}, 1) BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+        END;
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS {fts_table}_au AFTER UPDATE OF {column_list} ON {table}
+        WHEN IFNULL(old.id <= {last_id}, 1) BEGIN
+            INSERT INTO {fts_table} ({fts_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+            INSERT INTO {fts_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+        END;
+    """)
+
+
+def _create_search_indexes(conn):
+    """Миграция 8: полнотекстовый поиск клиентов (имя, email, телефон) и товаров (название)."""
+    _create_fts_table(conn, "clients_fts")
+    _create_fts_table(conn, "products_fts")
+
+
+def _create_order_search_index(conn):
+    """Миграция 9: полнотекстовый поиск заказов по составу (orders.items_summary)."""
+    _create_fts_table(conn, "orders_fts")
+
+
+def _add_order_client_name(conn):
+    """Миграция 10: имя клиента в самой записи заказа, чтобы сортировка по нему шла по индексу.
+
+    Имя копируется при оформлении заказа (add_order), а триггеры на clients поддерживают
+    его при переименовании и удалении клиента.
+    """
+    if not _column_exists(conn, "orders", "client_name"):
+        conn.execute("ALTER TABLE orders ADD COLUMN client_name TEXT;")
+        conn.execute("""
+            UPDATE orders SET client_name = (SELECT c.name FROM clients c WHERE c.id = orders.client_id)
+             WHERE client_id IS NOT NULL;
+        """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_orders_client_name ON orders(IFNULL(client_name, ''));")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS clients_name_au AFTER UPDATE OF name ON clients BEGIN
+            UPDATE orders SET client_name = new.name WHERE client_id = new.id;
+        END;
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS clients_name_ad AFTER DELETE ON clients BEGIN
+            UPDATE orders SET client_name = NULL WHERE client_id = old.id;
+        END;
+    """)
+
+
+def _drop_clients_insert_trigger(conn):
+    """Миграция 11: новые клиенты индексируются в clients_fts пачкой, а не триггером на каждую строку.
+
+    Отменена миграцией 12: без триггера клиенты, добавленные в обход приложения, не
+    попадали в поиск, а их последующее изменение повреждало индекс.
+    """
+    conn.execute("DROP TRIGGER IF EXISTS clients_fts_ai;")
+
+
+def _defer_search_indexing(conn):
+    """Миграция 12: полнотекстовые индексы дозаполняются в фоне, триггер вставки в clients возвращается.
+
+    Триггеры пересоздаются с условием из _create_fts_table. Индексы, которые прежние
+    миграции 8 и 9 построили целиком ('rebuild'), отмечаются полными. В clients_fts после
+    миграции 11 могли не попасть клиенты, добавленные в обход приложения, поэтому этот
+    индекс очищается и строится заново backfill_search_indexes.
+    """
+    _create_search_state(conn)
+    for fts_table in FTS_TABLES:
+        complete = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = ?;", (f"{fts_table}_ai",)
+        ).fetchone()
+        if complete:
+            conn.execute("INSERT OR IGNORE INTO search_index_state (fts_table, last_id) VALUES (?, NULL);",
+                         (fts_table,))
+        else:
+            conn.execute(f"INSERT INTO {fts_table} ({fts_table}) VALUES ('delete-all');")
+            conn.execute("DELETE FROM search_index_state WHERE fts_table = ?;", (fts_table,))
+        for suffix in ("ai", "ad", "au"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {fts_table}_{suffix};")
+        _create_fts_table(conn, fts_table)
+
+
+# Миграции схемы по порядку: номер версии = позиция в списке + 1. Текущая версия
+# базы хранится в PRAGMA user_version. Каждая миграция написана идемпотентно, чтобы
+# корректно отработать и на базах, созданных до появления версионирования.
+# Новые изменения схемы добавляются только в конец списка.
+MIGRATIONS = (
+    _create_base_schema,
+    _materialize_order_totals,
+    _create_page_indexes,
+    _create_foreign_key_indexes,
+    _create_analytics_indexes,
+    _create_analytics_cache,
+    _add_client_city,
+    _create_search_indexes,
+    _create_order_search_index,
+    _add_order_client_name,
+    _drop_clients_insert_trigger,
+    _defer_search_indexing,
+)
+
+
+def get_schema_version(conn=None):
+    """Возвращает версию схемы базы данных (PRAGMA user_version)."""
+    conn = conn or get_connection()
+    return conn.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def migrate():
+    """Применяет к базе данных недостающие миграции и возвращает итоговую версию схемы.
+
+    Каждая миграция выполняется в своей транзакции вместе с повышением user_version.
+    BEGIN IMMEDIATE не даёт двум одновременно запущенным приложениям применить
+    одну и ту же миграцию дважды.
+    """
+    conn = get_connection()
+    while True:
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            version = get_schema_version(conn)
+            if version >= len(MIGRATIONS):
+                conn.rollback()
+                return version
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1};")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
 
 
 def create_tables():
-    """Создает таблицы в базе данных, если они ещё не существуют."""
+    """Создает таблицы в базе данных, если они ещё не существуют, и обновляет схему до текущей версии."""
     try:
-        with get_connection() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS clients (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    email TEXT NOT NULL UNIQUE,
-                    phone TEXT NOT NULL,
-                    address TEXT
-                );
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    name TEXT NOT NULL,
-                    price REAL NOT NULL
-                );
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS orders (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    client_id INTEGER,
-                    order_date TEXT NOT NULL,
-                    FOREIGN KEY (client_id) REFERENCES clients(id)
-                );
-            """)
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS order_products (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    order_id INTEGER,
-                    product_id INTEGER,
-                    quantity INTEGER DEFAULT 1,
-                    FOREIGN KEY (order_id) REFERENCES orders(id),
-                    FOREIGN KEY (product_id) REFERENCES products(id)
-                );
-            """)
+        migrate()
     except sqlite3.Error as e:
         print(f"Ошибка при создании таблиц: {e}")
 
@@ -60,10 +473,13 @@ def add_client(client):
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT INTO clients (name, email, phone, address) VALUES (?, ?, ?, ?)",
-                (client.name, client.email, client.phone, client.address)
+                "INSERT INTO clients (name, email, phone, address, city) VALUES (?, ?, ?, ?, ?)",
+                (client.name, client.email, client.phone, client.address, client.city)
             )
             conn.commit()
+            get_catalog().add(Client.from_row(
+                (cursor.lastrowid, client.name, client.email, client.phone, client.address, client.city)
+            ))
             return cursor.lastrowid
     except sqlite3.IntegrityError:
         raise ValueError("Клиент с таким email уже существует.")
@@ -76,11 +492,10 @@ def get_all_clients():
     """Получает список всех клиентов из базы данных."""
     try:
         with get_connection() as conn:
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM clients;")
-            rows = cursor.fetchall()
-            return [Client(**dict(row)) for row in rows]
+            cursor.row_factory = Client.row_factory
+            cursor.execute("SELECT id, name, email, phone, address, city FROM clients;")
+            return cursor.fetchall()
     except sqlite3.Error as e:
         print(f"Ошибка БД: {e}")
         return []
@@ -96,6 +511,7 @@ def add_product(product):
                 (product.name, product.price)
             )
             conn.commit()
+            get_catalog().add(Product.from_row((cursor.lastrowid, product.name, product.price)))
             return cursor.lastrowid
     except sqlite3.Error as e:
         print(f"Ошибка БД: {e}")
@@ -106,33 +522,159 @@ def get_all_products():
     """Получает список всех товаров из базы данных."""
     try:
         with get_connection() as conn:
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            cursor.execute("SELECT * FROM products;")
-            rows = cursor.fetchall()
-            return [Product(**dict(row)) for row in rows]
+            cursor.row_factory = Product.row_factory
+            cursor.execute("SELECT id, name, price FROM products;")
+            return cursor.fetchall()
     except sqlite3.Error as e:
         print(f"Ошибка БД: {e}")
         return []
 
 
+# Сколько совпадений по умолчанию возвращает поиск
+SEARCH_LIMIT = 20
+
+
+def fts_query(text):
+    """Превращает введённый текст в запрос FTS5: каждое слово ищется как префикс, все слова обязательны.
+
+    Возвращает None, если в тексте нет ни одного слова. Служебный синтаксис FTS5
+    (кавычки, операторы) из пользовательского ввода не передаётся.
+    """
+    words = re.findall(r"\w+", text or "")
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _search(table, columns, factory, text, limit):
+    """Ищет строки table по индексу FTS5 (лучшие совпадения первыми); при пустом запросе — первые по id."""
+    query = fts_query(text)
+    try:
+        with get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = factory
+            select = ", ".join(f"t.{column}" for column in columns)
+            if query is None:
+                cursor.execute(f"SELECT {select} FROM {table} t ORDER BY t.id LIMIT ?;", (limit,))
+            else:
+                cursor.execute(f"""
+                    SELECT {select}
+                    FROM {table}_fts f
+                    JOIN {table} t ON t.id = f.rowid
+                    WHERE {table}_fts MATCH ?
+                    ORDER BY f.rank
+                    LIMIT ?;
+                """, (query, limit))
+            return cursor.fetchall()
+    except sqlite3.Error as e:
+        print(f"Ошибка БД: {e}")
+        return []
+
+
+def search_clients(text, limit=SEARCH_LIMIT):
+    """Ищет клиентов по началу слов в имени, email и телефоне, например "иван gmail" или "7999"."""
+    return _search("clients", ("id", "name", "email", "phone", "address", "city"), Client.row_factory, text, limit)
+
+
+def search_products(text, limit=SEARCH_LIMIT):
+    """Ищет товары по началу слов в названии."""
+    return _search("products", ("id", "name", "price"), Product.row_factory, text, limit)
+
+
+class Catalog:
+    """Кэш справочников клиентов и товаров в памяти: словари id -> объект модели.
+
+    Записи (client / product) читаются из базы по первичному ключу при первом
+    обращении; списки для выбора строит полнотекстовый поиск, а не справочник.
+    Сохранённые через add_client / add_product записи добавляются в кэш без
+    повторного чтения таблиц. Массовые изменения (импорт из CSV) сбрасывают его
+    через invalidate().
+    """
+
+    def __init__(self, db_file):
+        self.db_file = db_file
+        self._lock = threading.Lock()
+        self._items = {Client: {}, Product: {}}
+
+    def _get(self, model, item_id, fetch_page):
+        with self._lock:
+            item = self._items[model].get(item_id)
+            if item is not None:
+                return item
+        items, _ = fetch_page(filters={"id": item_id}, page_size=1)
+        if not items:
+            return None
+        self.add(items[0])
+        return items[0]
+
+    def client(self, client_id):
+        """Возвращает клиента по id или None, если такого нет."""
+        return self._get(Client, client_id, get_clients_page)
+
+    def product(self, product_id):
+        """Возвращает товар по id или None, если такого нет."""
+        return self._get(Product, product_id, get_products_page)
+
+    def add(self, item):
+        """Добавляет сохранённого клиента или товар в кэш."""
+        with self._lock:
+            self._items[type(item)][item.id] = item
+
+    def invalidate(self, clients=True, products=True):
+        """Сбрасывает справочники; записи будут перечитаны из базы при следующем обращении."""
+        with self._lock:
+            for model, reset in ((Client, clients), (Product, products)):
+                if reset:
+                    self._items[model] = {}
+
+
+_catalog = None
+
+
+def get_catalog():
+    """Возвращает кэш справочников для текущего DB_FILE."""
+    global _catalog
+    catalog = _catalog
+    if catalog is None or catalog.db_file != DB_FILE:
+        with _pool_lock:
+            if _catalog is None or _catalog.db_file != DB_FILE:
+                _catalog = Catalog(DB_FILE)
+            catalog = _catalog
+    return catalog
+
+
 def add_order(order):
-    """Добавляет новый заказ в базу данных."""
+    """Добавляет новый заказ в базу данных.
+
+    Позиции заказа (order.lines) уже объединены по товару, поэтому каждый товар
+    занимает одну строку order_products с количеством; все строки вставляются одним
+    executemany. Цена каждого товара запоминается в позиции заказа, а итоговая стоимость,
+    количество товаров и строка с перечнем позиций сохраняются в самой записи заказа.
+    Поэтому изменение цены товара не меняет уже оформленные заказы, а список заказов
+    не требует соединения с позициями и товарами.
+    """
+    lines = Order.aggregate_lines(order.lines)
     try:
         with get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute(
-                "INSERT INTO orders (client_id, order_date) VALUES (?, ?);",
-                (order.client_id, order.order_date)
+                """INSERT INTO orders (client_id, order_date, client_name)
+                   VALUES (?, ?, (SELECT name FROM clients WHERE id = ?));""",
+                (order.client_id, order.order_date, order.client_id)
             )
             order_id = cursor.lastrowid
 
-            # Добавляем продукты в заказ
-            for product in order.products:
-                cursor.execute(
-                    "INSERT INTO order_products (order_id, product_id) VALUES (?, ?);",
-                    (order_id, product.id)
-                )
+            # Добавляем позиции заказа, фиксируя текущую цену товаров
+            cursor.executemany(
+                """INSERT INTO order_products (order_id, product_id, quantity, price)
+                   SELECT ?, id, ?, price FROM products WHERE id = ?;""",
+                [(order_id, quantity, product_id) for product_id, quantity in lines]
+            )
+            if cursor.rowcount != len(lines):
+                # Исключение внутри with откатывает транзакцию вместе с заказом
+                raise ValueError("В заказе есть несуществующий товар.")
+            cursor.execute(_UPDATE_ORDER_TOTALS + " WHERE id = ?;", (order_id,))
             conn.commit()
             return order_id
     except sqlite3.Error as e:
@@ -143,67 +685,837 @@ def get_all_orders():
     """Получает список всех заказов из базы данных."""
     try:
         with get_connection() as conn:
-            conn.row_factory = sqlite3.Row
             cursor = conn.cursor()
-            query = """
-                SELECT o.id AS order_id, o.order_date, c.name AS client_name,
-                       GROUP_CONCAT(p.name || ': ' || op.quantity) AS items,
-                       SUM(p.price * op.quantity) AS total_cost
+            cursor.row_factory = Order.row_factory
+            # Итоги хранятся в самой записи заказа, нужен только поиск имени клиента по ключу
+            cursor.execute("""
+                SELECT o.id, o.client_id, o.order_date, c.name AS client_name,
+                       o.items_summary AS items, o.total_cost, o.items_count
                 FROM orders o
                 LEFT JOIN clients c ON o.client_id = c.id
-                LEFT JOIN order_products op ON o.id = op.order_id
-                LEFT JOIN products p ON op.product_id = p.id
-                GROUP BY o.id
                 ORDER BY o.id ASC;
-            """
-            cursor.execute(query)
-            result = cursor.fetchall()
-            # Преобразуем raw-записи в объекты Order
-            orders = [
-                Order(
-                    id=row['order_id'],
-                    client_id=None,  # Так как client_id нам тут не нужен, ставим None
-                    products=[],     # Мы получаем готовые товары и их цены, поэтому пустой список
-                    order_date=row['order_date'],
-                    _total_cost=row['total_cost'],  # Добавляем скрытый атрибут для удобства
-                    client_name=row['client_name'], # Передаем дополнительно имя клиента
-                    items=row['items']              # Списки товаров
-                ) for row in result
-            ]
-            return orders
+            """)
+            return cursor.fetchall()
     except sqlite3.Error as e:
         print(f"Ошибка БД: {e}")
         return []
 
-def export_data_to_json(file_path):
-    """Экспортирует данные клиентов и товаров в JSON-файл."""
-    data = {
-        "clients": [c.__dict__ for c in get_all_clients()],
-        "products": [p.__dict__ for p in get_all_products()]
-    }
+# Размер страницы по умолчанию для постраничных запросов
+PAGE_SIZE = 100
+
+# Индексы для сортировки и фильтрации постраничных запросов. Вторичный индекс SQLite
+# неявно содержит rowid (id), поэтому порядок (столбец, id) читается прямо из индекса.
+PAGE_INDEXES = (
+    "CREATE INDEX IF NOT EXISTS idx_clients_name ON clients(name);",
+    "CREATE INDEX IF NOT EXISTS idx_clients_phone ON clients(phone);",
+    "CREATE INDEX IF NOT EXISTS idx_clients_address ON clients(IFNULL(address, ''));",
+    "CREATE INDEX IF NOT EXISTS idx_products_name ON products(name);",
+    "CREATE INDEX IF NOT EXISTS idx_products_price ON products(price);",
+    "CREATE INDEX IF NOT EXISTS idx_orders_total_cost ON orders(total_cost);",
+)
+
+# Имя клиента хранится в заказе (миграция 10), поэтому соединение с clients не нужно
+_ORDERS_PAGE_SOURCE = """(
+    SELECT id, client_id, order_date, client_name, items_summary AS items, total_cost, items_count
+    FROM orders
+)"""
+
+
+def _order_from_record(record):
+    return Order(
+        id=record['id'],
+        client_id=record['client_id'],
+        products=[],
+        order_date=record['order_date'],
+        _total_cost=record['total_cost'],
+        client_name=record['client_name'],
+        items=record['items'],
+        items_count=record['items_count']
+    )
+
+
+# Описание постраничных выборок: источник строк, SQL-выражения допустимых столбцов
+# сортировки/фильтрации (только они попадают в текст запроса), столбцы только для фильтров
+# (сортировать по ним нельзя), фабрика объектов моделей из словаря и условие полнотекстового
+# поиска (каждый ? получает запрос FTS5).
+_PAGE_SPECS = {
+    "clients": {
+        "source": "clients",
+        "columns": {
+            "id": "id",
+            "name": "name",
+            "email": "email",
+            "phone": "phone",
+            "address": "IFNULL(address, '')",
+        },
+        "factory": lambda record: Client(**record),
+        "search": "id IN (SELECT rowid FROM clients_fts WHERE clients_fts MATCH ?)",
+    },
+    "products": {
+        "source": "products",
+        "columns": {
+            "id": "id",
+            "name": "name",
+            "price": "price",
+        },
+        "factory": lambda record: Product(**record),
+        "search": "id IN (SELECT rowid FROM products_fts WHERE products_fts MATCH ?)",
+    },
+    "orders": {
+        "source": _ORDERS_PAGE_SOURCE,
+        "columns": {
+            "id": "id",
+            "client_id": "client_id",
+            "order_date": "order_date",
+            "client_name": "IFNULL(client_name, '')",
+            "total_cost": "total_cost",
+        },
+        # Курсор (NULL, id) не сравнивается с другими значениями, поэтому заказы без клиента
+        # при сортировке по client_id выпадали бы из выдачи
+        "filter_only": ("client_id",),
+        "factory": _order_from_record,
+        # Заказ находится по данным клиента или по составу
+        "search": "(client_id IN (SELECT rowid FROM clients_fts WHERE clients_fts MATCH ?)"
+                  " OR id IN (SELECT rowid FROM orders_fts WHERE orders_fts MATCH ?))",
+    },
+}
+
+# Операторы фильтров: ключ фильтра "столбец__оператор", без оператора — равенство
+_FILTER_OPERATORS = {
+    "eq": "=",
+    "lt": "<",
+    "lte": "<=",
+    "gt": ">",
+    "gte": ">=",
+}
+
+
+def _build_filters(columns, filters):
+    """Переводит словарь фильтров в список условий WHERE и параметров."""
+    conditions, params = [], []
+    for key, value in (filters or {}).items():
+        column, _, op = key.partition("__")
+        if column not in columns:
+            raise ValueError(f"Недопустимый столбец фильтра: {column}")
+        expr = columns[column]
+        if op == "prefix":
+            # Префиксный поиск диапазоном, чтобы использовать индекс
+            conditions.append(f"{expr} >= ? AND {expr} < ?")
+            params.extend((value, value + "\uffff"))
+        elif op in ("", "eq") or op in _FILTER_OPERATORS:
+            conditions.append(f"{expr} {_FILTER_OPERATORS[op or 'eq']} ?")
+            params.append(value)
+        else:
+            raise ValueError(f"Недопустимый оператор фильтра: {op}")
+    return conditions, params
+
+
+def _fetch_page(entity, filters=None, sort="id", descending=False, after=None, page_size=PAGE_SIZE, before=None,
+                search=None):
+    """Возвращает одну страницу записей и курсор для следующей.
+
+    Постраничный вывод построен на курсоре-ключе (keyset): курсор — это пара
+    (значение столбца сортировки, id) последней записи страницы, и следующая страница
+    начинается строго после неё. В отличие от OFFSET стоимость запроса не растёт
+    с номером страницы.
+
+    Если вместо after передан before, возвращается страница, стоящая непосредственно
+    перед этим курсором (в том же порядке сортировки), а курсор указывает на её первую
+    запись — по нему можно запросить ещё более раннюю страницу.
+
+    search — текст для полнотекстового поиска (см. fts_query); совпадения отбираются
+    по индексу FTS5 и дальше сортируются и листаются так же, как без поиска.
+    """
+    spec = _PAGE_SPECS[entity]
+    columns = spec["columns"]
+    if sort not in columns or sort in spec.get("filter_only", ()):
+        raise ValueError(f"Недопустимый столбец сортировки: {sort}")
+    sort_expr = columns[sort]
+    backward = before is not None
+    if backward:
+        # Страницу "до курсора" читаем в обратном порядке и затем разворачиваем
+        after, descending = before, not descending
+    direction = "DESC" if descending else "ASC"
+
+    conditions, params = _build_filters(columns, filters)
+    match = fts_query(search)
+    if match is not None:
+        conditions.append(spec["search"])
+        params.extend([match] * spec["search"].count("?"))
+    if after is not None:
+        op = "<" if descending else ">"
+        if sort == "id":
+            conditions.append(f"id {op} ?")
+            params.append(after[1])
+        else:
+            # Эквивалент (sort_expr, id) > (?, ?), записанный так, чтобы SQLite
+            # взял диапазон по индексу столбца сортировки
+            conditions.append(f"{sort_expr} {op}= ? AND ({sort_expr} {op} ? OR id {op} ?)")
+            params.extend((after[0], after[0], after[1]))
+
+    query = f"SELECT *, {sort_expr} AS sort_key FROM {spec['source']}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if sort == "id":
+        query += f" ORDER BY id {direction}"
+    else:
+        query += f" ORDER BY {sort_expr} {direction}, id {direction}"
+    query += " LIMIT ?;"
+    params.append(page_size + 1)
+
+    try:
+        with get_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+    except sqlite3.Error as e:
+        print(f"Ошибка БД: {e}")
+        return [], None
+
+    has_more = len(rows) > page_size
+    items = []
+    cursor = None
+    for row in rows[:page_size]:
+        record = dict(row)
+        cursor = (record.pop("sort_key"), record["id"])
+        items.append(spec["factory"](record))
+    if backward:
+        items.reverse()
+    return items, (cursor if has_more else None)
+
+
+def page_cursor(item, sort="id"):
+    """Возвращает курсор (значение сортировки, id) для объекта модели — так же, как его строит _fetch_page."""
+    value = getattr(item, sort)
+    return (value if value is not None else "", item.id)
+
+
+def get_clients_page(filters=None, sort="id", descending=False, after=None, page_size=PAGE_SIZE, before=None,
+                     search=None):
+    """Возвращает страницу клиентов и курсор следующей страницы (None, если страниц больше нет).
+
+    filters — словарь вида {"name__prefix": "Ив", "phone": "+7900..."}; допустимые операторы:
+    eq (по умолчанию), lt, lte, gt, gte, prefix. sort — id, name, email, phone или address.
+    before — курсор, перед которым нужно вернуть страницу (прокрутка назад).
+    search — поиск по началу слов в имени, email и телефоне.
+    """
+    return _fetch_page("clients", filters, sort, descending, after, page_size, before, search)
+
+
+def get_products_page(filters=None, sort="id", descending=False, after=None, page_size=PAGE_SIZE, before=None,
+                      search=None):
+    """Возвращает страницу товаров и курсор следующей страницы. sort — id, name или price."""
+    return _fetch_page("products", filters, sort, descending, after, page_size, before, search)
+
+
+def get_orders_page(filters=None, sort="id", descending=False, after=None, page_size=PAGE_SIZE, before=None,
+                    search=None):
+    """Возвращает страницу заказов и курсор следующей страницы.
+
+    sort — id, order_date, client_name или total_cost; фильтры по ним и по client_id,
+    например {"client_id": 3, "order_date__gte": "2024-01-01"} (см. order_filters).
+    search — поиск по данным клиента (имя, email, телефон) и по названиям товаров в заказе.
+    """
+    return _fetch_page("orders", filters, sort, descending, after, page_size, before, search)
+
+
+def order_filters(date_from=None, date_to=None, client_id=None, min_total=None, max_total=None):
+    """Собирает фильтры get_orders_page из условий поиска заказов; None — условие не задано.
+
+    date_from / date_to — дни 'YYYY-MM-DD', обе границы включительно; min_total / max_total —
+    границы суммы заказа. Каждое условие проверяется по своему индексу (order_date,
+    client_id, total_cost).
+    """
+    filters = {}
+    if date_from is not None:
+        filters["order_date__gte"] = date_from
+    if date_to is not None:
+        # Все заказы дня date_to: 'YYYY-MM-DD HH:MM:SS' < 'YYYY-MM-DD~'
+        filters["order_date__lt"] = date_to + "~"
+    if client_id is not None:
+        filters["client_id"] = client_id
+    if min_total is not None:
+        filters["total_cost__gte"] = min_total
+    if max_total is not None:
+        filters["total_cost__lte"] = max_total
+    return filters
+
+
+def get_last_id(table):
+    """Возвращает наибольший id в таблице clients, products или orders (0 для пустой таблицы).
+
+    Записи только добавляются, поэтому это значение служит водяным знаком: пока оно
+    не изменилось, построенные по таблице результаты можно не пересчитывать.
+    """
+    if table not in ("clients", "products", "orders"):
+        raise ValueError(f"Недопустимая таблица: {table}")
+    try:
+        with get_connection() as conn:
+            return conn.execute(f"SELECT IFNULL(MAX(id), 0) FROM {table};").fetchone()[0]
+    except sqlite3.Error as e:
+        print(f"Ошибка БД: {e}")
+        return None
+
+
+def _clear_analytics(conn):
+    conn.execute("DELETE FROM analytics_daily;")
+    conn.execute("DELETE FROM analytics_clients;")
+    conn.execute("UPDATE analytics_state SET last_order_id = 0;")
+
+
+def refresh_analytics(rebuild=False):
+    """Досчитывает кэш аналитики по заказам, добавленным после прошлого обновления.
+
+    Кэш хранит выручку и число заказов по дням (analytics_daily) и по клиентам
+    (analytics_clients), а также наибольший уже учтённый orders.id (водяной знак).
+    Заказы в приложении только добавляются, а AUTOINCREMENT не выдаёт id повторно,
+    поэтому достаточно прибавить к агрегатам заказы с id больше водяного знака.
+    Если водяной знак оказался больше последнего заказа (база заменена или заказы
+    удалены), а также при rebuild=True кэш пересчитывается целиком.
+
+    Возвращает водяной знак после обновления: по нему можно понять, менялись ли данные.
+    """
+    conn = get_connection()
+    # BEGIN IMMEDIATE: два потока не учтут одни и те же заказы дважды
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        last_id = conn.execute("SELECT last_order_id FROM analytics_state WHERE id = 1;").fetchone()[0]
+        max_id = conn.execute("SELECT IFNULL(MAX(id), 0) FROM orders;").fetchone()[0]
+        if rebuild or max_id < last_id:
+            _clear_analytics(conn)
+            last_id = 0
+        if max_id > last_id:
+            params = (last_id, max_id)
+            conn.execute("""
+                INSERT INTO analytics_daily (day, revenue, orders_count)
+                SELECT substr(order_date, 1, 10), SUM(total_cost), COUNT(*)
+                  FROM orders WHERE id > ? AND id <= ?
+                 GROUP BY 1
+                ON CONFLICT(day) DO UPDATE SET
+                    revenue = revenue + excluded.revenue,
+                    orders_count = orders_count + excluded.orders_count;
+            """, params)
+            # Заказы без клиента учитываются под client_id = 0
+            conn.execute("""
+                INSERT INTO analytics_clients (client_id, total, orders_count)
+                SELECT IFNULL(client_id, 0), SUM(total_cost), COUNT(*)
+                  FROM orders WHERE id > ? AND id <= ?
+                 GROUP BY 1
+                ON CONFLICT(client_id) DO UPDATE SET
+                    total = total + excluded.total,
+                    orders_count = orders_count + excluded.orders_count;
+            """, params)
+            conn.execute("UPDATE analytics_state SET last_order_id = ?;", (max_id,))
+        conn.commit()
+        return max_id
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def _segment_conditions(date_from=None, date_to=None, city=None):
+    """Условия отбора заказов для отчёта по периоду и сегменту: (список условий, параметры).
+
+    date_from / date_to — дни 'YYYY-MM-DD' (включительно / не включительно), city — город
+    клиента. Заказы отбираются по индексам orders(order_date) и clients(city).
+    """
+    conditions, params = [], []
+    if date_from is not None:
+        conditions.append("o.order_date >= ?")
+        params.append(date_from[:10])
+    if date_to is not None:
+        conditions.append("o.order_date < ?")
+        params.append(date_to[:10])
+    if city is not None:
+        conditions.append("o.client_id IN (SELECT id FROM clients WHERE city = ?)")
+        params.append(city)
+    return conditions, params
+
+
+def get_top_clients(n=5, date_from=None, date_to=None, city=None, refresh=True):
+    """Возвращает топ-N клиентов по общей сумме заказов: список пар (имя клиента, сумма).
+
+    Без условий суммы берутся из кэша аналитики, который перед чтением дополняется только
+    новыми заказами; отбор идёт по индексу analytics_clients(total), в Python возвращаются
+    N строк. С периодом (date_from / date_to, как в get_daily_revenue) или городом клиента
+    city суммы считаются группировкой по отобранным заказам. Заказы без клиента (в кэше
+    они учтены под client_id = 0) в топ не попадают.
+
+    refresh=False — кэш читается как есть, без записи в базу (его досчитывают заранее).
+    """
+    conditions, params = _segment_conditions(date_from, date_to, city)
+    source = "analytics_clients"
+    if conditions:
+        source = f"""(
+            SELECT o.client_id, SUM(o.total_cost) AS total
+            FROM orders o
+            WHERE {" AND ".join(conditions)}
+            GROUP BY o.client_id
+        )"""
+    try:
+        if refresh and not conditions:
+            refresh_analytics()
+        with get_connection() as conn:
+            rows = conn.execute(f"""
+                SELECT c.name AS client_name, a.total
+                FROM {source} a
+                LEFT JOIN clients c ON c.id = a.client_id
+                WHERE a.client_id IS NOT NULL AND a.client_id <> 0
+                ORDER BY a.total DESC
+                LIMIT ?;
+            """, (*params, n)).fetchall()
+            return [(row["client_name"], row["total"]) for row in rows]
+    except sqlite3.Error as e:
+        print(f"Ошибка БД: {e}")
+        return []
+
+
+def get_daily_revenue(date_from=None, date_to=None, city=None, refresh=True):
+    """Возвращает выручку по дням: список (день 'YYYY-MM-DD', сумма, число заказов) по возрастанию даты.
+
+    date_from / date_to — необязательные границы периода в днях 'YYYY-MM-DD'
+    (включительно / не включительно). Данные читаются из кэша аналитики, который
+    перед чтением дополняется только новыми заказами (при refresh=False кэш читается
+    как есть, без записи в базу). С городом клиента city выручка считается группировкой
+    по заказам этого города.
+    """
+    if city is not None:
+        conditions, params = _segment_conditions(date_from, date_to, city)
+        query = f"""
+            SELECT substr(o.order_date, 1, 10) AS day, SUM(o.total_cost) AS revenue, COUNT(*) AS orders_count
+            FROM orders o
+            WHERE {" AND ".join(conditions)}
+            GROUP BY day
+            ORDER BY day;
+        """
+    else:
+        conditions, params = [], []
+        if date_from is not None:
+            conditions.append("day >= ?")
+            params.append(date_from[:10])
+        if date_to is not None:
+            conditions.append("day < ?")
+            params.append(date_to[:10])
+        where = ("WHERE " + " AND ".join(conditions)) if conditions else ""
+        query = f"""
+            SELECT day, revenue, orders_count
+            FROM analytics_daily
+            {where}
+            ORDER BY day;
+        """
+    try:
+        if refresh and city is None:
+            refresh_analytics()
+        with get_connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+            return [tuple(row) for row in rows]
+    except sqlite3.Error as e:
+        print(f"Ошибка БД: {e}")
+        return []
+
+
+def get_city_counts():
+    """Возвращает число клиентов по городам: список (город, число клиентов) по убыванию числа.
+
+    Группировка идёт по индексу clients.city, адреса при этом не разбираются.
+    """
+    try:
+        with get_connection() as conn:
+            rows = conn.execute("""
+                SELECT city, COUNT(*) AS clients_count
+                FROM clients
+                GROUP BY city
+                ORDER BY clients_count DESC, city;
+            """).fetchall()
+            return [tuple(row) for row in rows]
+    except sqlite3.Error as e:
+        print(f"Ошибка БД: {e}")
+        return []
+
+
+def get_city_clients_sample(city, n):
+    """Возвращает имена до n случайных клиентов из указанного города (выборка по индексу clients.city)."""
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except IOError as e:
-        print(f"Ошибка записи в файл: {e}")
+        with get_connection() as conn:
+            rows = conn.execute(
+                "SELECT name FROM clients WHERE city = ? ORDER BY random() LIMIT ?;", (city, n)
+            ).fetchall()
+            return [row["name"] for row in rows]
+    except sqlite3.Error as e:
+        print(f"Ошибка БД: {e}")
+        return []
+
+
+# Сколько строк за раз читается из курсора при потоковой выгрузке
+EXPORT_CHUNK_SIZE = 1000
+
+
+def iter_rows(conn, query, params=(), chunk_size=EXPORT_CHUNK_SIZE):
+    """Построчно отдаёт результат запроса, читая курсор порциями через fetchmany."""
+    cursor = conn.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield from rows
+
+
+def iter_order_chunks(chunk_size=EXPORT_CHUNK_SIZE):
+    """Отдаёт заказы порциями — списками простых кортежей (id, client_name, order_date, total_cost).
+
+    Кортежи читаются без sqlite3.Row и без создания объектов Order, поэтому подходят для
+    построчной загрузки в столбцы NumPy/pandas.
+    """
+    cursor = get_connection().cursor()
+    cursor.row_factory = None
+    cursor.execute("""
+        SELECT o.id, c.name, o.order_date, o.total_cost
+        FROM orders o
+        LEFT JOIN clients c ON o.client_id = c.id
+        ORDER BY o.id;
+    """)
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        yield rows
+
+
+def _iter_orders_with_lines(conn, chunk_size):
+    """Отдаёт заказы вместе с их позициями, сливая два упорядоченных по id заказа курсора."""
+    lines = iter_rows(conn, """
+        SELECT order_id, product_id, quantity, price FROM order_products ORDER BY order_id, id;
+    """, chunk_size=chunk_size)
+    line = next(lines, None)
+    for row in iter_rows(conn, "SELECT * FROM orders ORDER BY id;", chunk_size=chunk_size):
+        order = dict(row)
+        order["items"] = []
+        # Позиции без заказа (если такие есть) пропускаем
+        while line is not None and (line["order_id"] is None or line["order_id"] < order["id"]):
+            line = next(lines, None)
+        while line is not None and line["order_id"] == order["id"]:
+            order["items"].append({
+                "product_id": line["product_id"],
+                "quantity": line["quantity"],
+                "price": line["price"],
+            })
+            line = next(lines, None)
+        yield order
+
+
+def _export_sections(conn, chunk_size):
+    """Возвращает выгружаемые разделы: (название, тип записи, генератор словарей)."""
+    return (
+        ("clients", "client", (dict(row) for row in iter_rows(conn, "SELECT * FROM clients ORDER BY id;",
+                                                              chunk_size=chunk_size))),
+        ("products", "product", (dict(row) for row in iter_rows(conn, "SELECT * FROM products ORDER BY id;",
+                                                                chunk_size=chunk_size))),
+        ("orders", "order", _iter_orders_with_lines(conn, chunk_size)),
+    )
+
+
+def export_data_to_json(file_path, fmt=None, compress=None, chunk_size=EXPORT_CHUNK_SIZE, task=None):
+    """Экспортирует клиентов, товары и заказы (с позициями) в JSON-файл.
+
+    Данные читаются из базы порциями и сразу пишутся в файл, поэтому расход памяти
+    не зависит от размера таблиц.
+
+    fmt: "json" — один объект {"clients": [...], "products": [...], "orders": [...]};
+         "ndjson" — по одной записи на строку с полем "type". По умолчанию определяется
+         по расширению файла (.ndjson / .jsonl).
+    compress: сжимать ли файл gzip. По умолчанию — если имя файла оканчивается на .gz.
+    task: фоновая задача (tasks.Task) для отчёта о числе выгруженных записей и отмены;
+          при отмене недописанный файл удаляется.
+
+    Возвращает количество выгруженных записей или None, если выгрузка отменена.
+    """
+    name = file_path[:-3] if file_path.endswith(".gz") else file_path
+    if compress is None:
+        compress = file_path.endswith(".gz")
+    if fmt is None:
+        fmt = "ndjson" if name.endswith((".ndjson", ".jsonl")) else "json"
+    if fmt not in ("json", "ndjson"):
+        raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+
+    opener = gzip.open if compress else open
+    conn = get_connection()
+    written = 0
+    with opener(file_path, 'wt', encoding='utf-8') as f:
+        if fmt == "json":
+            f.write("{")
+        for section_no, (section, record_type, records) in enumerate(_export_sections(conn, chunk_size)):
+            if fmt == "json":
+                f.write(",\n" if section_no else "\n")
+                f.write(f'    "{section}": [')
+            for record_no, record in enumerate(records):
+                if fmt == "ndjson":
+                    f.write(json.dumps({"type": record_type, **record}, ensure_ascii=False))
+                    f.write("\n")
+                else:
+                    f.write(",\n        " if record_no else "\n        ")
+                    f.write(json.dumps(record, ensure_ascii=False))
+                written += 1
+                if task is not None and written % chunk_size == 0:
+                    task.report_progress(written)
+                    if task.is_cancelled():
+                        break
+            if fmt == "json":
+                f.write("\n    ]")
+            if task is not None and task.is_cancelled():
+                break
+        if fmt == "json":
+            f.write("\n}\n")
+    if task is not None and task.is_cancelled():
+        os.remove(file_path)
+        return None
+    return written
+
+
+class ImportReport:
+    """Итог импорта клиентов: счётчики и перечень проблемных строк CSV."""
+
+    def __init__(self):
+        self.inserted = 0   # добавлено новых клиентов
+        self.skipped = 0    # пропущено из-за повторяющегося email
+        self.failed = 0     # отклонено из-за некорректных данных
+        self.errors = []    # список (номер строки, причина)
+        self.cancelled = False  # импорт прерван пользователем (уже вставленные пачки сохраняются)
+
+    def skip(self, line_no, reason):
+        self.skipped += 1
+        self.errors.append((line_no, reason))
+
+    def fail(self, line_no, reason):
+        self.failed += 1
+        self.errors.append((line_no, reason))
+
+    def to_dict(self):
+        return {
+            "inserted": self.inserted,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "errors": [{"line": line_no, "reason": reason} for line_no, reason in self.errors],
+        }
+
+    def __str__(self):
+        summary = f"Добавлено: {self.inserted}, пропущено: {self.skipped}, с ошибками: {self.failed}"
+        return ("Импорт прерван. " + summary) if self.cancelled else summary
+
+
+# Количество строк CSV, которые проверяются и вставляются в одной транзакции
+IMPORT_BATCH_SIZE = 5000
+
+# Ограничение на число параметров в одном запросе IN (...)
+_MAX_SQL_PARAMS = 900
+
+_CLIENT_CSV_FIELDS = ("name", "email", "phone", "address")
+
+
+def _existing_emails(conn, emails):
+    """Возвращает множество email из переданных, которые уже есть в таблице clients."""
+    emails = list(emails)
+    found = set()
+    for start in range(0, len(emails), _MAX_SQL_PARAMS):
+        part = emails[start:start + _MAX_SQL_PARAMS]
+        placeholders = ",".join("?" * len(part))
+        rows = conn.execute(f"SELECT email FROM clients WHERE email IN ({placeholders});", part)
+        found.update(row[0] for row in rows)
+    return found
+
+
+def _csv_row_reader(header):
+    """Функция, которая выбирает из строки CSV значения полей _CLIENT_CSV_FIELDS по заголовку header.
+
+    Как и csv.DictReader: при повторах в заголовке берётся последний столбец, отсутствующие
+    столбцы и недостающие значения в короткой строке дают None. Словарь на каждую строку
+    не создаётся.
+    """
+    columns = {name: i for i, name in enumerate(header)}
+    positions = [columns.get(field) for field in _CLIENT_CSV_FIELDS]
+
+    def values_slow(row):
+        return tuple(row[i] if i is not None and i < len(row) else None for i in positions)
+
+    if None in positions:
+        return values_slow
+    get, width = itemgetter(*positions), max(positions) + 1
+    return lambda row: get(row) if len(row) >= width else values_slow(row)
+
+
+def _import_clients_batch(conn, batch, report):
+    """Проверяет пачку строк CSV (номер строки, значения полей) и вставляет корректные одним executemany."""
+    rows = []
+    for line_no, values in batch:
+        if None in values:
+            missing = ", ".join(f for f, v in zip(_CLIENT_CSV_FIELDS, values) if v is None)
+            report.fail(line_no, f"Отсутствуют поля: {missing}")
+            continue
+        rows.append((line_no, values))
+
+    # Email и телефоны всей пачки проверяются одним вызовом, без исключений на каждую строку
+    errors = validate_clients([values[1] for _, values in rows], [values[2] for _, values in rows])
+    valid = {}
+    for (line_no, values), error in zip(rows, errors):
+        if error is not None:
+            report.fail(line_no, error)
+            continue
+        email = values[1]
+        if email in valid:
+            report.skip(line_no, f"Повторяющийся email в файле: {email}")
+            continue
+        valid[email] = (line_no, values)
+
+    with conn:
+        for email in _existing_emails(conn, valid):
+            line_no, _ = valid.pop(email)
+            report.skip(line_no, f"Клиент с таким email уже существует: {email}")
+        # Даже невыполняемый триггер на вставку замедляет executemany почти вдвое: на время
+        # пачки он удаляется, а пачку добавит в индекс поиска backfill_search_indexes.
+        # Отметка и триггер меняются в той же транзакции, другие соединения их отсутствия не видят.
+        _defer_search_indexing(conn, ("clients_fts",))
+        conn.execute("DROP TRIGGER IF EXISTS clients_fts_ai;")
+        conn.executemany(
+            "INSERT INTO clients (name, email, phone, address, city) VALUES (?, ?, ?, ?, ?)",
+            [values + (extract_city(values[3]),) for _, values in valid.values()]
+        )
+        _create_fts_triggers(conn, "clients_fts")
+    report.inserted += len(valid)
+
+
+def backfill_client_cities(batch_size=IMPORT_BATCH_SIZE, task=None):
+    """Заполняет clients.city у клиентов, добавленных до появления этого столбца.
+
+    Строки обрабатываются пачками по batch_size, каждая в своей транзакции, поэтому
+    прерванное заполнение продолжается с того же места. Повторный вызов после
+    завершения сводится к одному запросу по индексу. Возвращает число обновлённых строк.
+
+    task — фоновая задача (tasks.Task): после каждой пачки ей сообщается число
+    обновлённых строк, и заполнение останавливается, если задачу отменили.
+    """
+    conn = get_connection()
+    updated = 0
+    while True:
+        rows = conn.execute(
+            "SELECT id, address FROM clients WHERE city IS NULL LIMIT ?;", (batch_size,)
+        ).fetchall()
+        if not rows:
+            break
+        with conn:
+            conn.executemany(
+                "UPDATE clients SET city = ? WHERE id = ?;",
+                [(extract_city(row["address"]), row["id"]) for row in rows]
+            )
+        updated += len(rows)
+        if task is not None:
+            task.report_progress(updated)
+            if task.is_cancelled():
+                break
+    return updated
+
+
+def defer_search_indexing(*fts_tables):
+    """Откладывает индексацию новых строк в fts_tables (по умолчанию во всех индексах поиска).
+
+    Для массовой вставки: триггеры перестают индексировать строки по одной, новые
+    строки добавит в индекс пачками backfill_search_indexes. До этого поиск их не находит.
+    """
+    with get_connection() as conn:
+        _defer_search_indexing(conn, fts_tables or FTS_TABLES)
+
+
+def _defer_search_indexing(conn, fts_tables):
+    for fts_table in fts_tables:
+        table = FTS_TABLES[fts_table][0]
+        conn.execute(f"""
+            UPDATE search_index_state SET last_id = (SELECT IFNULL(MAX(id), 0) FROM {table})
+             WHERE fts_table = ? AND last_id IS NULL;
+        """, (fts_table,))
+
+
+def backfill_search_indexes(batch_size=IMPORT_BATCH_SIZE, task=None):
+    """Добавляет в полнотекстовые индексы строки, которые в них ещё не попали.
+
+    Такие строки остаются после миграций 8, 9 и 12 (индексы создаются пустыми) и после
+    defer_search_indexing. Строки индексируются по возрастанию id пачками по batch_size,
+    каждая пачка — в своей транзакции вместе с отметкой в search_index_state, поэтому
+    прерванное заполнение продолжается с того же места. Когда строк не остаётся, индекс
+    отмечается полным и дальше его поддерживают триггеры. Возвращает число добавленных строк.
+
+    task — фоновая задача (tasks.Task): после каждой пачки ей сообщается число
+    добавленных строк, и заполнение останавливается, если задачу отменили.
+    """
+    conn = get_connection()
+    indexed = 0
+    for fts_table, (table, columns) in FTS_TABLES.items():
+        column_list = ", ".join(columns)
+        while True:
+            # BEGIN IMMEDIATE: строки, добавленные другими соединениями между чтением
+            # отметки и её записью, не пропадут
+            conn.execute("BEGIN IMMEDIATE;")
+            try:
+                row = conn.execute(
+                    "SELECT last_id FROM search_index_state WHERE fts_table = ?;", (fts_table,)
+                ).fetchone()
+                ids = []
+                if row is not None and row[0] is not None:
+                    ids = [r[0] for r in conn.execute(
+                        f"SELECT id FROM {table} WHERE id > ? ORDER BY id LIMIT ?;", (row[0], batch_size)
+                    )]
+                if ids:
+                    conn.execute(f"""
+                        INSERT INTO {fts_table} (rowid, {column_list})
+                        SELECT id, {column_list} FROM {table} WHERE id > ? AND id <= ?;
+                    """, (row[0], ids[-1]))
+                # Строк не осталось — индекс полный (last_id = NULL)
+                conn.execute("UPDATE search_index_state SET last_id = ? WHERE fts_table = ?;",
+                             (ids[-1] if ids else None, fts_table))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            if not ids:
+                break
+            indexed += len(ids)
+            if task is not None:
+                task.report_progress(indexed)
+                if task.is_cancelled():
+                    return indexed
+    return indexed
+
+
+def import_data_from_csv(file_path, batch_size=IMPORT_BATCH_SIZE, task=None):
+    """Импортирует данные клиентов из CSV-файла.
+
+    Строки читаются потоково и обрабатываются пачками по batch_size: каждая пачка
+    проверяется и вставляется одним executemany в отдельной транзакции.
+    Возвращает ImportReport с количеством добавленных, пропущенных и ошибочных строк.
 
+    task — фоновая задача (tasks.Task): после каждой пачки ей сообщается прогресс
+    в байтах файла, и импорт останавливается, если задачу отменили.
 
-def import_data_from_csv(file_path):
-    """Импортирует данные клиентов из CSV-файла."""
+    Для поиска клиенты индексируются не при вставке, а потом, пачками:
+    поиск находит их после вызова backfill_search_indexes.
+    """
+    report = ImportReport()
+    conn = get_connection()
+    total_bytes = os.path.getsize(file_path)
     try:
         with open(file_path, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
+            reader = csv.reader(f)
+            values = _csv_row_reader(next(reader, []))
+            batch = []
             for row in reader:
-                try:
-                    client = Client(
-                        name=row['name'],
-                        email=row['email'],
-                        phone=row['phone'],
-                        address=row['address']
-                    )
-                    client.validate()
-                    add_client(client)
-                except (ValueError, KeyError) as e:
-                    print(f"Ошибка в строке CSV: {row}. {e}")
-    except IOError as e:
-        print(f"Ошибка чтения файла: {e}")
\ No newline at end of file
+                if row:
+                    batch.append((reader.line_num, values(row)))
+                if len(batch) >= batch_size:
+                    _import_clients_batch(conn, batch, report)
+                    batch = []
+                    if task is not None:
+                        task.report_progress(f.buffer.tell(), total_bytes)
+                        if task.is_cancelled():
+                            report.cancelled = True
+                            return report
+            if batch:
+                _import_clients_batch(conn, batch, report)
+        return report
+    finally:
+        # Добавленные клиенты попадут в справочник при следующем обращении к нему
+        get_catalog().invalidate(products=False)
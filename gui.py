@@ -3,18 +3,261 @@ from itertools import count
 from tkinter import ttk, messagebox, filedialog
 from datetime import datetime
 from tkinter.ttk import Button
-import operator
 
-# Импортирование библиотек для визуализации
-from matplotlib.figure import Figure
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-import analysis
 import db
+from tasks import TaskExecutor
 from models import Client, Product, Order
 import csv
 
 
+def _analysis():
+    """Возвращает модуль analysis, импортируя его при первом обращении.
+
+    analysis тянет за собой pandas, matplotlib и networkx; они нужны только на вкладке
+    анализа, поэтому не загружаются при запуске приложения.
+    """
+    import analysis
+    return analysis
+
+
+class LazyTreeview:
+    """Виртуализированное наполнение ttk.Treeview.
+
+    В таблице держится только окно записей вокруг видимой области (не больше max_rows).
+    При прокрутке к краю окна следующая или предыдущая страница догружается из базы
+    по курсору-ключу, а строки с противоположного края удаляются. Идентификатор строки
+    в Treeview совпадает с id записи, поэтому отдельную запись можно обновить точечно.
+    """
+
+    def __init__(self, tree, scrollbar, fetch_page, to_values, sort="id", page_size=100, max_rows=500):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.fetch_page = fetch_page  # функция db.get_*_page
+        self.to_values = to_values    # объект модели -> кортеж значений строки
+        self.sort = sort
+        self.descending = False
+        self.filters = None
+        self.search = None
+        self.page_size = page_size
+        self.max_rows = max_rows
+        self._keys = []               # курсоры строк окна в порядке отображения
+        self._has_before = False      # есть записи выше окна
+        self._has_after = False       # есть записи ниже окна
+        self._loading = False
+        tree.configure(yscrollcommand=self._on_scroll)
+
+    def reload(self):
+        """Перечитывает таблицу с начала: загружаются первые две страницы."""
+        self.tree.delete(*self.tree.get_children())
+        self._keys = []
+        items, cursor = self._fetch(page_size=self.page_size * 2)
+        self._append(items)
+        self._has_before = False
+        self._has_after = cursor is not None
+
+    def set_query(self, search=None, filters=None):
+        """Показывает только записи, найденные по тексту search и фильтрам filters, с начала."""
+        self.search, self.filters = search, filters
+        self.reload()
+
+    def sort_by(self, sort, heading=None):
+        """Сортирует таблицу по полю sort средствами базы данных.
+
+        Повторный вызов с тем же полем меняет направление. Таблица перечитывается с начала,
+        загружаются только первые страницы. heading — столбец Treeview, если его имя
+        отличается от поля сортировки; в его заголовке рисуется стрелка направления.
+        """
+        if sort == self.sort:
+            self.descending = not self.descending
+        else:
+            self.sort, self.descending = sort, False
+        self._mark_heading(heading or sort)
+        self.reload()
+
+    def _mark_heading(self, column):
+        """Ставит стрелку направления сортировки в заголовок столбца и убирает её у остальных."""
+        for col in self.tree["columns"]:
+            text = self.tree.heading(col, "text").rstrip(" ▲▼")
+            if col == column:
+                text += " ▼" if self.descending else " ▲"
+            self.tree.heading(col, text=text)
+
+    def _fetch(self, **kwargs):
+        kwargs.setdefault("page_size", self.page_size)
+        return self.fetch_page(filters=self.filters, sort=self.sort, descending=self.descending,
+                               search=self.search, **kwargs)
+
+    def _key(self, item):
+        return db.page_cursor(item, self.sort)
+
+    def _append(self, items):
+        for item in items:
+            self.tree.insert("", "end", iid=str(item.id), values=self.to_values(item))
+            self._keys.append(self._key(item))
+
+    def _on_scroll(self, first, last):
+        """Обработчик прокрутки: двигает полосу прокрутки и при необходимости догружает данные."""
+        self.scrollbar.set(first, last)
+        if self._loading:
+            return
+        if float(last) >= 0.9 and self._has_after:
+            self._loading = True
+            self.tree.after_idle(self._load_next)
+        elif float(first) <= 0.1 and self._has_before:
+            self._loading = True
+            self.tree.after_idle(self._load_previous)
+
+    def _top_index(self):
+        """Индекс первой видимой строки."""
+        return round(self.tree.yview()[0] * len(self._keys))
+
+    def _load_next(self):
+        """Догружает страницу ниже окна и удаляет лишние строки сверху."""
+        try:
+            top = self._top_index()
+            items, cursor = self._fetch(after=self._keys[-1])
+            self._append(items)
+            self._has_after = cursor is not None
+            extra = len(self._keys) - self.max_rows
+            if extra > 0:
+                children = self.tree.get_children()
+                self.tree.delete(*children[:extra])
+                del self._keys[:extra]
+                self._has_before = True
+                self.tree.yview_moveto(max(top - extra, 0) / len(self._keys))
+        finally:
+            self._loading = False
+
+    def _load_previous(self):
+        """Догружает страницу выше окна и удаляет лишние строки снизу."""
+        try:
+            top = self._top_index()
+            items, cursor = self._fetch(before=self._keys[0])
+            for item in reversed(items):
+                self.tree.insert("", 0, iid=str(item.id), values=self.to_values(item))
+                self._keys.insert(0, self._key(item))
+            self._has_before = cursor is not None
+            extra = len(self._keys) - self.max_rows
+            if extra > 0:
+                children = self.tree.get_children()
+                self.tree.delete(*children[-extra:])
+                del self._keys[-extra:]
+                self._has_after = True
+            self.tree.yview_moveto((top + len(items)) / len(self._keys))
+        finally:
+            self._loading = False
+
+    def _position(self, key):
+        """Место, куда по порядку сортировки встаёт строка с данным курсором (бинарный поиск)."""
+        low, high = 0, len(self._keys)
+        while low < high:
+            middle = (low + high) // 2
+            before = self._keys[middle] > key if self.descending else self._keys[middle] < key
+            if before:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def show_item(self, item):
+        """Добавляет или обновляет одну запись, не перечитывая таблицу.
+
+        Если запись по порядку сортировки оказывается за пределами загруженного окна,
+        она появится при прокрутке.
+        """
+        iid = str(item.id)
+        if self.tree.exists(iid):
+            self.tree.item(iid, values=self.to_values(item))
+            return
+        if self.search or self.filters:
+            return  # новая запись может не подходить под условия поиска
+        key = self._key(item)
+        index = self._position(key)
+        if (index == 0 and self._has_before) or (index == len(self._keys) and self._has_after):
+            return
+        self.tree.insert("", index, iid=iid, values=self.to_values(item))
+        self._keys.insert(index, key)
+
+
+class SearchPicker:
+    """Выпадающий список с поиском по мере ввода.
+
+    Варианты не загружаются заранее: после паузы в наборе текста (delay мс) в фоне
+    выполняется search(text, limit) — поиск по полнотекстовому индексу — и в список
+    попадают только лучшие limit совпадений. Ответы на устаревший текст отбрасываются.
+    """
+
+    # Клавиши навигации по списку не запускают новый поиск
+    NAVIGATION_KEYS = {"Up", "Down", "Left", "Right", "Return", "Escape", "Tab", "Home", "End"}
+
+    def __init__(self, combobox, executor, search, to_choice, delay=250, limit=db.SEARCH_LIMIT):
+        self.combobox = combobox
+        self.executor = executor
+        self.search = search          # функция db.search_*
+        self.to_choice = to_choice    # объект -> строка "id: ..."
+        self.delay = delay
+        self.limit = limit
+        self._after_id = None
+        combobox.bind("<KeyRelease>", self._on_key)
+
+    def _on_key(self, event):
+        if event.keysym in self.NAVIGATION_KEYS:
+            return
+        if self._after_id is not None:
+            self.combobox.after_cancel(self._after_id)
+        self._after_id = self.combobox.after(self.delay, self.refresh)
+
+    def refresh(self):
+        """Запускает поиск по текущему тексту поля."""
+        self._after_id = None
+        text = self.combobox.get()
+        self.executor.submit(self.search, text, self.limit, on_done=lambda items: self._show(text, items))
+
+    def _show(self, text, items):
+        if self.combobox.get() != text:
+            return  # пока шёл поиск, текст изменился — ждём ответа на новый запрос
+        self.combobox["values"] = [self.to_choice(item) for item in items]
+
+    def selected_id(self):
+        """Возвращает id выбранной записи или None, если в поле не выбран вариант из списка."""
+        head, sep, _ = self.combobox.get().partition(":")
+        return int(head) if sep and head.isdigit() else None
+
+
+class ProgressDialog(tk.Toplevel):
+    """Окно прогресса долгой фоновой задачи с кнопкой отмены."""
+
+    def __init__(self, master, title, text):
+        super().__init__(master)
+        self.title(title)
+        self.resizable(False, False)
+        self.transient(master)
+        self.task = None
+
+        self.label = tk.Label(self, text=text)
+        self.label.pack(padx=20, pady=(20, 5))
+        self.bar = ttk.Progressbar(self, length=300, mode="indeterminate")
+        self.bar.pack(padx=20, pady=5)
+        self.bar.start()
+        self.cancel_button = ttk.Button(self, text="Отмена", command=self.cancel)
+        self.cancel_button.pack(pady=(5, 20))
+        self.protocol("WM_DELETE_WINDOW", self.cancel)
+
+    def update_progress(self, done, total=None):
+        """Колбэк прогресса: при известном total показывает процент, иначе — счётчик."""
+        if total:
+            self.bar.stop()
+            self.bar.configure(mode="determinate", maximum=total, value=done)
+        else:
+            self.label.configure(text=f"Обработано записей: {done}")
+
+    def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+            self.cancel_button.configure(state="disabled")
+            self.label.configure(text="Отмена...")
+
+
 class App(tk.Tk):
 
     def __init__(self):
@@ -27,26 +270,81 @@ class App(tk.Tk):
         self.title("Система учета заказов")
         self.geometry("1000x700")  # Размеры окна
 
+        # Фоновые потоки для долгих обращений к базе и аналитике
+        self.executor = TaskExecutor(self)
+        self._debounce_ids = {}  # отложенные вызовы debounce() по именам
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+
         # Основной контейнер вкладок
-        notebook = ttk.Notebook(self)
-        notebook.pack(padx=10, pady=10, fill="both", expand=True)
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(padx=10, pady=10, fill="both", expand=True)
+        # Вкладка -> функция, заполняющая её данными при первом показе
+        self._tab_loaders = {}
 
         # Добавляем вкладки
-        self.create_clients_tab(notebook)
-        self.create_products_tab(notebook)
-        self.create_orders_tab(notebook)
-        self.create_analysis_tab(notebook)
-        self.create_admin_tab(notebook)
+        self.create_clients_tab(self.notebook)
+        self.create_products_tab(self.notebook)
+        self.create_orders_tab(self.notebook)
+        self.create_analysis_tab(self.notebook)
+        self.create_admin_tab(self.notebook)
+
+        # Данные загружаются не при создании окна, а когда вкладку впервые открывают
+        self.notebook.bind("<<NotebookTabChanged>>", lambda e: self.load_current_tab())
+        self.after_idle(self.load_current_tab)
+        # Индексы поиска после обновления схемы дозаполняются в фоне, окно их не ждёт
+        self.index_search()
+
+    def add_tab(self, notebook, frame, text, loader=None):
+        """Добавляет вкладку; loader() вызывается один раз, при первом показе вкладки."""
+        notebook.add(frame, text=text)
+        if loader is not None:
+            self._tab_loaders[str(frame)] = loader
+
+    def load_current_tab(self):
+        """Заполняет открытую вкладку, если она показывается впервые."""
+        loader = self._tab_loaders.pop(self.notebook.select(), None)
+        if loader is not None:
+            loader()
+
+    def index_search(self):
+        """Добавляет в индексы поиска строки, которые в них ещё не попали (db.backfill_search_indexes)."""
+        self.executor.submit(db.backfill_search_indexes, pass_task=True, on_error=self.show_error("Индекс поиска"))
+
+    def on_close(self):
+        """Останавливает фоновые задачи и закрывает окно."""
+        self.executor.shutdown()
+        self.destroy()
+
+    def show_error(self, title):
+        """Возвращает колбэк, показывающий ошибку фоновой задачи."""
+        return lambda e: messagebox.showerror(title, str(e))
+
+    def run_with_progress(self, title, text, func, *args, on_done=None):
+        """Запускает долгую задачу в фоне и показывает окно прогресса с кнопкой отмены."""
+        dialog = ProgressDialog(self, title, text)
+
+        def finish(callback):
+            def handler(result):
+                dialog.destroy()
+                callback(result)
+            return handler
+
+        dialog.task = self.executor.submit(
+            func, *args, pass_task=True,
+            on_done=finish(on_done or (lambda result: None)),
+            on_error=finish(self.show_error(title)),
+            on_progress=dialog.update_progress
+        )
 
     def create_clients_tab(self, notebook):
         """Вкладка 'Клиенты'"""
         """
           Здесь создаются форма для добавления новых клиентов и таблица TreeView для отображения существующих клиентов. 
-          Реализована поддержка вертикального скроллинга. После загрузки приложения сразу выполняется 
+          Реализована поддержка вертикального скроллинга. При первом показе вкладки выполняется
           метод refresh_clients_list() для заполнения таблицы данными из базы.
         """
         frame = ttk.Frame(notebook)
-        notebook.add(frame, text="Клиенты")
+        self.add_tab(notebook, frame, "Клиенты", self.refresh_clients_list)
 
         # Форма добавления клиента
         form_frame = ttk.Labelframe(frame, text="Добавить/Изменить клиента")
@@ -72,6 +370,14 @@ class App(tk.Tk):
         # Кнопка сохранения клиента
         ttk.Button(form_frame, text="Сохранить", command=self.save_client).grid(row=4, columnspan=2, pady=10)
 
+        # Строка поиска: таблица перечитывается после паузы в наборе текста
+        search_frame = ttk.Frame(frame)
+        search_frame.pack(fill="x", padx=10)
+        tk.Label(search_frame, text="Поиск:").pack(side="left")
+        self.client_search = tk.Entry(search_frame, width=40)
+        self.client_search.pack(side="left", padx=5)
+        self.client_search.bind("<KeyRelease>", lambda e: self.debounce("clients", self.search_clients))
+
         # Таблица клиентов
         tree_frame = ttk.Frame(frame)
         tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
@@ -97,34 +403,30 @@ class App(tk.Tk):
 
         scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.client_tree.yview)
         scrollbar.pack(side="right", fill="y")
-        self.client_tree.configure(yscrollcommand=scrollbar.set)
+        self.clients_view = LazyTreeview(
+            self.client_tree, scrollbar, db.get_clients_page,
+            lambda c: (c.id, c.name, c.email, c.phone, c.address or "")
+        )
 
-        # Обновляем таблицу
-        self.refresh_clients_list()
-
-    # Метод сортировки по выбранному столбцу
-    def sort_by_column(self, col):
-        items = [(self.client_tree.set(child, col), child) for child in self.client_tree.get_children()]
-        sorted_items = sorted(items, key=operator.itemgetter(0))
+    def debounce(self, name, func, delay=300):
+        """Вызывает func через delay мс; повторный вызов с тем же name до этого момента откладывает запуск."""
+        pending = self._debounce_ids.get(name)
+        if pending is not None:
+            self.after_cancel(pending)
 
-        # Переставляем порядок элементов
-        for index, (_, item_id) in enumerate(sorted_items):
-            self.client_tree.move(item_id, '', index)
+        def run():
+            del self._debounce_ids[name]
+            func()
 
-        # Инвертируем направление сортировки
-        self.client_tree.heading(col, command=lambda _col=col: self.reverse_sort(_col))
+        self._debounce_ids[name] = self.after(delay, run)
 
-    # Метод обратного порядка сортировки
-    def reverse_sort(self, col):
-        items = [(self.client_tree.set(child, col), child) for child in self.client_tree.get_children()]
-        sorted_items = sorted(items, key=operator.itemgetter(0), reverse=True)
+    def search_clients(self):
+        """Показывает клиентов, найденных по имени, email или телефону"""
+        self.clients_view.set_query(search=self.client_search.get().strip() or None)
 
-        # Переставляем порядок элементов обратно
-        for index, (_, item_id) in enumerate(sorted_items):
-            self.client_tree.move(item_id, '', index)
-
-        # Возвращаем обычный порядок сортировки
-        self.client_tree.heading(col, command=lambda _col=col: self.sort_by_column(_col))
+    # Сортировка по выбранному столбцу: повторный щелчок меняет направление
+    def sort_by_column(self, col):
+        self.clients_view.sort_by(col)
 
     def save_client(self):
         """Сохраняет данные клиента"""
@@ -140,39 +442,29 @@ class App(tk.Tk):
             client.validate()
 
             # Сохраняем нового клиента в базу данных
-            db.add_client(client)
+            client.id = db.add_client(client)
 
             # Сообщаем пользователю о успешном сохранении
             messagebox.showinfo("Успех", "Клиент успешно добавлен.")
 
-            # Обновляем список клиентов в таблице
-            self.refresh_clients_list()
-            self.populate_order_comboboxes()
+            # Добавляем новую строку в таблицу и в выпадающий список заказа
+            self.clients_view.show_item(client)
+            self.order_client["values"] = (*self.order_client["values"], self.client_choice(client))
         except Exception as e:
             messagebox.showerror("Ошибка", str(e))
 
     def refresh_clients_list(self):
         """Обновляет список клиентов в таблице"""
         """
-        Этот метод очищает старую версию таблицы и заново загружает свежие данные из базы, вставляя
-        их в виде строк.
+        Этот метод очищает таблицу и загружает из базы только первые страницы клиентов;
+        остальные подгружаются при прокрутке (см. LazyTreeview).
         """
-        # Очищаем дерево перед обновлением
-        for i in self.client_tree.get_children():
-            self.client_tree.delete(i)
-
-        # Получаем всех клиентов из базы данных
-        clients = db.get_all_clients()
-
-        # Заполняем таблицу новыми клиентами
-        for client in clients:
-            self.client_tree.insert("", "end",
-                                    values=(client.id, client.name, client.email, client.phone, client.address))
+        self.clients_view.reload()
 
     def create_products_tab(self, notebook):
         """Вкладка 'Товары'"""
         frame = ttk.Frame(notebook)
-        notebook.add(frame, text="Товары")
+        self.add_tab(notebook, frame, "Товары", self.refresh_products_list)
 
         # Форма добавления товара
         form_frame = ttk.Labelframe(frame, text="Добавить товар")
@@ -210,32 +502,13 @@ class App(tk.Tk):
 
         scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.product_tree.yview)
         scrollbar.pack(side="right", fill="y")
-        self.product_tree.configure(yscrollcommand=scrollbar.set)
-
-        # Обновляем таблицу
-        self.refresh_products_list()
+        self.products_view = LazyTreeview(
+            self.product_tree, scrollbar, db.get_products_page,
+            lambda p: (p.id, p.name, f'{p.price:.2f}')
+        )
 
     def sort_products_by_column(self, col):
-        items = [(self.product_tree.set(child, col), child) for child in self.product_tree.get_children()]
-        sorted_items = sorted(items, key=operator.itemgetter(0))
-
-        # Перемещение элементов
-        for index, (_, item_id) in enumerate(sorted_items):
-            self.product_tree.move(item_id, '', index)
-
-        # Изменение направления сортировки
-        self.product_tree.heading(col, command=lambda _col=col: self.reverse_sort_products(_col))
-
-    def reverse_sort_products(self, col):
-        items = [(self.product_tree.set(child, col), child) for child in self.product_tree.get_children()]
-        sorted_items = sorted(items, key=operator.itemgetter(0), reverse=True)
-
-        # Перемещение элементов
-        for index, (_, item_id) in enumerate(sorted_items):
-            self.product_tree.move(item_id, '', index)
-
-        # Возвращение обычного порядка сортировки
-        self.product_tree.heading(col, command=lambda _col=col: self.sort_products_by_column(_col))
+        self.products_view.sort_by(col)
 
     def save_product(self):
         """Сохраняет новый продукт"""
@@ -244,47 +517,26 @@ class App(tk.Tk):
             product = Product(name=self.product_name.get(), price=price)
 
             # Сохраняем новый продукт в базу данных
-            db.add_product(product)
+            product.id = db.add_product(product)
 
             # Сообщаем пользователю о успехе
             messagebox.showinfo("Успех", "Товар успешно добавлен.")
 
-            # Обновляем таблицу продуктов
-            self.refresh_products_list()
-
-            #2 Обновляем список товаров после добавления
-            self.update_products_list()
-            self.populate_order_comboboxes()
+            # Добавляем новую строку в таблицу и в выпадающий список заказа
+            self.products_view.show_item(product)
+            self.order_product["values"] = (*self.order_product["values"], self.product_choice(product))
         except ValueError:
             messagebox.showerror("Ошибка", "Цена должна быть числом.")
 
-    def update_products_list(self): #2
-        # Получить свежий список товаров из базы данных
-        self.products_data = db.get_all_products()
-
-        # Перегрузить значения в Combobox
-        self.order_product['values'] = [f"{p.id}: {p.name}, Цена: {p.price:.2f} руб." for p in self.products_data]
-
-
-
     def refresh_products_list(self):
-        """Обновляет список товаров в таблице"""
-        # Очищаем дерево перед обновлением
-        for i in self.product_tree.get_children():
-            self.product_tree.delete(i)
-
-        # Получаем все товары из базы данных
-        products = db.get_all_products()
-
-        # Заполняем таблицу товарами
-        for product in products:
-            self.product_tree.insert("", "end", values=(product.id, product.name, f'{product.price:.2f}'))
+        """Обновляет список товаров в таблице (первые страницы, остальное — при прокрутке)"""
+        self.products_view.reload()
 
 
     def create_orders_tab(self, notebook):
         """Вкладка 'Заказы'"""
         frame = ttk.Frame(notebook)
-        notebook.add(frame, text="Заказы")
+        self.add_tab(notebook, frame, "Заказы", self.load_orders_tab)
 
         # Форма создания заказа
         form_frame = ttk.Labelframe(frame, text="Создать заказ")
@@ -292,24 +544,61 @@ class App(tk.Tk):
 
         # Выбор клиента
         tk.Label(form_frame, text="Клиент:").grid(row=0, column=0, padx=5, pady=5)
-        self.order_client = ttk.Combobox(form_frame, state="readonly", width=37)
+        self.order_client = ttk.Combobox(form_frame, width=37)
         self.order_client.grid(row=0, column=1, padx=5, pady=5)
+        self.client_picker = SearchPicker(self.order_client, self.executor, db.search_clients, self.client_choice)
 
         # Выбор товара
         tk.Label(form_frame, text="Товар:").grid(row=1, column=0, padx=5, pady=5)
-        self.order_product = ttk.Combobox(form_frame, state="readonly", width=37)
+        self.order_product = ttk.Combobox(form_frame, width=37)
         self.order_product.grid(row=1, column=1, padx=5, pady=5)
+        self.product_picker = SearchPicker(self.order_product, self.executor, db.search_products, self.product_choice)
+
+        # Количество единиц выбранного товара
+        tk.Label(form_frame, text="Кол-во:").grid(row=1, column=2, padx=5, pady=5)
+        self.order_quantity = ttk.Spinbox(form_frame, from_=1, to=10000, width=6)
+        self.order_quantity.set(1)
+        self.order_quantity.grid(row=1, column=3, padx=5, pady=5)
 
         # Кнопка добавления товара в заказ
-        ttk.Button(form_frame, text="Добавить в заказ", command=self.add_product_to_order).grid(row=1, column=2, padx=5)
+        ttk.Button(form_frame, text="Добавить в заказ", command=self.add_product_to_order).grid(row=1, column=4, padx=5)
 
-        # Список товаров в заказе
+        # Список товаров в заказе: одна строка на товар, повторное добавление увеличивает количество
         self.order_products_list = tk.Listbox(frame, height=8, selectmode=tk.EXTENDED)
         self.order_products_list.pack(fill="x", padx=10, pady=10)
+        self.order_lines = {}  # id товара -> [строка товара из списка, количество]
 
         # Кнопка оформления заказа
         ttk.Button(frame, text="Оформить заказ", command=self.save_order).pack(pady=10)
 
+        # Поиск заказов: текст (клиент или товар), клиент, период и диапазон суммы
+        search_frame = ttk.Labelframe(frame, text="Поиск заказов")
+        search_frame.pack(fill="x", padx=10)
+        tk.Label(search_frame, text="Текст:").grid(row=0, column=0, padx=5, pady=5)
+        self.order_search = tk.Entry(search_frame, width=25)
+        self.order_search.grid(row=0, column=1, padx=5, pady=5)
+        tk.Label(search_frame, text="Клиент:").grid(row=0, column=2, padx=5, pady=5)
+        self.order_search_client = ttk.Combobox(search_frame, width=25)
+        self.order_search_client.grid(row=0, column=3, padx=5, pady=5)
+        self.order_search_client_picker = SearchPicker(
+            self.order_search_client, self.executor, db.search_clients, self.client_choice
+        )
+        tk.Label(search_frame, text="Дата с:").grid(row=1, column=0, padx=5, pady=5)
+        self.order_date_from = tk.Entry(search_frame, width=12)
+        self.order_date_from.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        tk.Label(search_frame, text="по:").grid(row=1, column=2, padx=5, pady=5)
+        self.order_date_to = tk.Entry(search_frame, width=12)
+        self.order_date_to.grid(row=1, column=3, padx=5, pady=5, sticky="w")
+        tk.Label(search_frame, text="Сумма от:").grid(row=2, column=0, padx=5, pady=5)
+        self.order_min_total = tk.Entry(search_frame, width=12)
+        self.order_min_total.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        tk.Label(search_frame, text="до:").grid(row=2, column=2, padx=5, pady=5)
+        self.order_max_total = tk.Entry(search_frame, width=12)
+        self.order_max_total.grid(row=2, column=3, padx=5, pady=5, sticky="w")
+        ttk.Button(search_frame, text="Найти", command=self.search_orders).grid(row=0, column=4, padx=5)
+        ttk.Button(search_frame, text="Сбросить", command=self.reset_order_search).grid(row=1, column=4, padx=5)
+        self.order_search.bind("<Return>", lambda e: self.search_orders())
+
         tree_frame = ttk.Frame(frame)
         tree_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
@@ -326,110 +615,140 @@ class App(tk.Tk):
 
         scrollbar = ttk.Scrollbar(tree_frame, orient="vertical", command=self.order_tree.yview)
         scrollbar.pack(side="right", fill="y")
-        self.order_tree.configure(yscrollcommand=scrollbar.set)
+        self.orders_view = LazyTreeview(
+            self.order_tree, scrollbar, db.get_orders_page,
+            lambda o: (o.id, o.client_name or "", o.order_date, f"{o.total_cost:.2f}")
+        )
 
-        # Обновляем таблицу заказов
+    def load_orders_tab(self):
+        """Заполняет таблицу заказов и выпадающие списки при первом показе вкладки"""
         self.refresh_orders_list()
         self.populate_order_comboboxes()
 
     def sort_orders_by_column(self, col):
-        items = [(self.order_tree.set(child, col), child) for child in self.order_tree.get_children()]
-        sorted_items = sorted(items, key=operator.itemgetter(0))
-
-        # Перемещение элементов
-        for index, (_, item_id) in enumerate(sorted_items):
-            self.order_tree.move(item_id, '', index)
+        # Столбцы таблицы заказов называются иначе, чем поля сортировки в базе
+        self.orders_view.sort_by({"client": "client_name", "date": "order_date", "cost": "total_cost"}.get(col, col),
+                                 heading=col)
 
-        # Обратная сортировка
-        self.order_tree.heading(col, command=lambda _col=col: self.reverse_sort_orders(_col))
+    @staticmethod
+    def client_choice(client):
+        return f"{client.id}: {client.name}"
 
-    def reverse_sort_orders(self, col):
-        items = [(self.order_tree.set(child, col), child) for child in self.order_tree.get_children()]
-        sorted_items = sorted(items, key=operator.itemgetter(0), reverse=True)
-
-        # Перемещение элементов
-        for index, (_, item_id) in enumerate(sorted_items):
-            self.order_tree.move(item_id, '', index)
-
-        # Обычная сортировка
-        self.order_tree.heading(col, command=lambda _col=col: self.sort_orders_by_column(_col))
+    @staticmethod
+    def product_choice(product):
+        return f"{product.id}: {product.name}, цена: {product.price:.2f} руб."
 
     def populate_order_comboboxes(self):
-        """Заполняет выпадающие списки клиентов и товаров"""
-        self.clients_data = db.get_all_clients()
-        self.products_data = db.get_all_products()
-
-        # Устанавливаем значения в выпадающих списках
-        self.order_client["values"] = [f"{c.id}: {c.name}" for c in self.clients_data]
-        self.order_product["values"] = [f"{p.id}: {p.name}, цена: {p.price:.2f} руб." for p in self.products_data]
+        """Заполняет выпадающие списки клиентов и товаров первыми совпадениями с введённым текстом"""
+        self.client_picker.refresh()
+        self.product_picker.refresh()
 
     def add_product_to_order(self):
         """Добавляет выбранный товар в список текущего заказа"""
-        selected_product = self.order_product.get()
-        if selected_product:
-            self.order_products_list.insert(tk.END, selected_product)
+        product_id = self.product_picker.selected_id()
+        if product_id is None:
+            messagebox.showerror("Ошибка", "Выберите товар из списка.")
+            return
+        try:
+            quantity = int(self.order_quantity.get())
+            if quantity < 1:
+                raise ValueError
+        except ValueError:
+            messagebox.showerror("Ошибка", "Количество должно быть целым положительным числом.")
+            return
+
+        # Товар ищется в справочнике по id, без загрузки всего каталога
+        product = db.get_catalog().product(product_id)
+        if product is None:
+            messagebox.showerror("Ошибка", "Товар не найден.")
+            return
+        if product_id in self.order_lines:
+            # Товар уже есть в заказе — увеличиваем количество в его строке
+            index = list(self.order_lines).index(product_id)
+            self.order_lines[product_id][1] += quantity
+            self.order_products_list.delete(index)
+        else:
+            index = tk.END
+            self.order_lines[product_id] = [self.product_choice(product), quantity]
+        text, total_quantity = self.order_lines[product_id]
+        self.order_products_list.insert(index, f"{text} × {total_quantity}")
 
     def save_order(self):
         """Сохраняет созданный заказ"""
         try:
-            client_str = self.order_client.get()
-            if not client_str:
-                raise ValueError("Выберите клиента.")
-
-            client_id = int(client_str.split(":")[0])  # Извлекаем ID клиента
-
-            # Выбираем товары из выбранного списка
-            product_ids = []
-            for idx in range(len(self.order_products_list.get(0, tk.END))):
-                product_item = self.order_products_list.get(idx)
-                product_id = int(product_item.split(":")[0])
-                product_ids.append(product_id)
+            client_id = self.client_picker.selected_id()  # Извлекаем ID клиента
+            if client_id is None:
+                raise ValueError("Выберите клиента из списка.")
+            if db.get_catalog().client(client_id) is None:
+                raise ValueError("Клиент не найден.")
 
             # Если ни одного товара не выбрано
-            if len(product_ids) == 0:
+            if not self.order_lines:
                 raise ValueError("Нет товаров в заказе.")
 
-            # Формируем объекты товаров
-            products_in_order = [p for p in self.products_data if p.id in product_ids]
-
+            # Позиции заказа: (id товара, количество); цены и итог рассчитывает база
             order = Order(
                 id=None,  # Тут устанавливаем None, так как id будет назначен автоматически
                 client_id=client_id,
-                products=products_in_order,
+                products=[],
                 order_date=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                _total_cost=sum([p.price for p in products_in_order])
+                lines=[(product_id, quantity) for product_id, (_, quantity) in self.order_lines.items()]
             )
             # Сохраняем заказ в базу данных
-            db.add_order(order)
+            order_id = db.add_order(order)
 
             # Уведомляем пользователя
             messagebox.showinfo("Успех", "Заказ успешно сохранён.")
 
-            # Обновляем список заказов
-            self.refresh_orders_list()
+            # Добавляем в таблицу только новый заказ (с именем клиента и итогом из базы)
+            saved, _ = db.get_orders_page(filters={"id": order_id}, page_size=1)
+            for saved_order in saved:
+                self.orders_view.show_item(saved_order)
 
             # Очищаем список товаров
             self.order_products_list.delete(0, tk.END)
+            self.order_lines.clear()
         except ValueError as e:
             messagebox.showerror("Ошибка", str(e))
 
-    def refresh_orders_list(self):
-        """Обновляет список заказов в таблице"""
-        # Очищаем дерево перед обновлением
-        for i in self.order_tree.get_children():
-            self.order_tree.delete(i)
+    def search_orders(self):
+        """Показывает заказы, подходящие под условия поиска"""
+        try:
+            def optional(entry, convert):
+                value = entry.get().strip()
+                return convert(value) if value else None
+
+            def day(value):
+                datetime.strptime(value, "%Y-%m-%d")  # проверка формата
+                return value
+
+            filters = db.order_filters(
+                date_from=optional(self.order_date_from, day),
+                date_to=optional(self.order_date_to, day),
+                client_id=self.order_search_client_picker.selected_id(),
+                min_total=optional(self.order_min_total, float),
+                max_total=optional(self.order_max_total, float),
+            )
+        except ValueError:
+            messagebox.showerror("Ошибка", "Даты указываются в формате ГГГГ-ММ-ДД, суммы — числами.")
+            return
+        self.orders_view.set_query(search=self.order_search.get().strip() or None, filters=filters)
 
-        orders = db.get_all_orders()
+    def reset_order_search(self):
+        """Очищает условия поиска и показывает все заказы"""
+        for entry in (self.order_search, self.order_search_client, self.order_date_from, self.order_date_to,
+                      self.order_min_total, self.order_max_total):
+            entry.delete(0, tk.END)
+        self.orders_view.set_query()
 
-        # Заполняем таблицу новыми заказами
-        for order in orders:
-            self.order_tree.insert("", "end",
-                                   values=(order.id, order.client_name, order.order_date, f"{order.total_cost:.2f}"))
+    def refresh_orders_list(self):
+        """Обновляет список заказов в таблице (первые страницы, остальное — при прокрутке)"""
+        self.orders_view.reload()
 
     def create_analysis_tab(self, notebook):
         """Вкладка анализа и визуализации"""
         frame = ttk.Frame(notebook)
-        notebook.add(frame, text="Анализ и Визуализация")
+        self.add_tab(notebook, frame, "Анализ и Визуализация", self.create_chart_canvas)
 
         # Панель кнопок
         btn_frame = ttk.Frame(frame)
@@ -440,37 +759,76 @@ class App(tk.Tk):
         ttk.Button(btn_frame, text="Динамика заказов", command=self.show_order_dynamics).pack(side="left", padx=5)
         ttk.Button(btn_frame, text="География клиентов", command=self.show_client_geography).pack(side="left", padx=5)
 
-        # Контейнер для графика
+        # Контейнер для графика; фигура и холст создаются при первом показе вкладки
         self.plot_canvas_frame = ttk.Frame(frame)
         self.plot_canvas_frame.pack(side="bottom", fill="both", expand=True)
+        self.chart_figure = None
+        self.chart_canvas = None
+        self._chart_shown = None  # (вид графика, водяной знак данных) того, что сейчас на холсте
+
+    def create_chart_canvas(self):
+        """Создаёт одну фигуру и один холст на все графики вкладки анализа.
+
+        matplotlib импортируется здесь, при первом показе вкладки, а модуль analysis
+        с pandas и networkx — сразу после этого в фоновом потоке.
+        """
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.chart_figure = Figure(figsize=(10, 6))
+        self.chart_canvas = FigureCanvasTkAgg(self.chart_figure, master=self.plot_canvas_frame)
+        self.chart_canvas.get_tk_widget().pack(side="top", fill="both", expand=True)
+        self.executor.submit(_analysis, on_error=self.show_error("Анализ"))
 
     def show_top_clients(self):
-        top_clients = analysis.get_top_clients()
-        # Подготавливаем список строк для отображения
-        formatted_clients = [f"{index}: {value:.2f}" for index, value in top_clients.items()]
-        # Объединяем строки для вывода
-        messagebox.showinfo("Топ клиенты", "\n".join(formatted_clients))
+        def show(top_clients):
+            # Подготавливаем список строк для отображения
+            formatted_clients = [f"{index}: {value:.2f}" for index, value in top_clients.items()]
+            # Объединяем строки для вывода
+            messagebox.showinfo("Топ клиенты", "\n".join(formatted_clients))
+
+        self.executor.submit(lambda: _analysis().get_top_clients(), on_done=show,
+                             on_error=self.show_error("Топ клиенты"))
+
+    def draw_chart(self, kind, plot, loaded):
+        """Рисует график на общем холсте вкладки анализа.
+
+        plot — имя функции построения в analysis; loaded — (водяной знак, данные) из
+        analysis.load_*; если на холсте уже этот график по тем же данным, ничего не
+        перерисовывается.
+        """
+        watermark, data = loaded
+        if self._chart_shown == (kind, watermark):
+            return
+        if getattr(_analysis(), plot)(data, fig=self.chart_figure) is None:
+            messagebox.showinfo("Анализ", "Нет данных для графика.")
+            return
+        self.chart_canvas.draw_idle()
+        self._chart_shown = (kind, watermark)
 
     def show_order_dynamics(self):
 
         """Показывает динамику изменения количества заказов по месяцам"""
-        fig = analysis.plot_order_dynamics()
-        canvas = FigureCanvasTkAgg(fig, master=self.plot_canvas_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side="top", fill="both", expand=True)
+        # Данные загружаются в фоне, а график строится в потоке интерфейса
+        self.executor.submit(
+            lambda: _analysis().load_order_dynamics(),
+            on_done=lambda loaded: self.draw_chart("order_dynamics", "plot_order_dynamics", loaded),
+            on_error=self.show_error("Динамика заказов")
+        )
 
     def show_client_geography(self):
 
         """Отображает географию распределения клиентов"""
-        fig = analysis.plot_client_geography_graph()
-        canvas = FigureCanvasTkAgg(fig, master=self.plot_canvas_frame)
-        canvas.draw()
-        canvas.get_tk_widget().pack(side="top", fill="both", expand=True)
+        self.executor.submit(
+            lambda: _analysis().load_client_geography(),
+            on_done=lambda loaded: self.draw_chart("client_geography", "plot_client_geography_graph", loaded),
+            on_error=self.show_error("География клиентов")
+        )
 
     def create_admin_tab(self, notebook):
         """Создает вкладку администрирования."""
         frame = ttk.Frame(notebook)
-        notebook.add(frame, text='Администрирование')
+        self.add_tab(notebook, frame, 'Администрирование')
 
         btn_frame = ttk.Frame(frame)
         btn_frame.pack(padx=20, pady=20)
@@ -485,22 +843,37 @@ class App(tk.Tk):
         """Импортирует данные из CSV-файла."""
         file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
         if file_path:
-            try:
-                db.import_data_from_csv(file_path)
-                messagebox.showinfo("Успех", "Данные успешно импортированы")
+            def show_report(report):
+                message = str(report)
+                if report.errors:
+                    # Показываем только первые проблемные строки, чтобы окно оставалось читаемым
+                    details = "\n".join(f"Строка {line_no}: {reason}" for line_no, reason in report.errors[:10])
+                    message += "\n\n" + details
+                messagebox.showinfo("Импорт завершён", message)
+                self.index_search()
                 self.refresh_clients_list()
-            except Exception as e:
-                messagebox.showerror("Ошибка импорта", str(e))
+                self.populate_order_comboboxes()
+
+            self.run_with_progress("Импорт из CSV", "Импорт клиентов...", db.import_data_from_csv, file_path,
+                                   on_done=show_report)
 
     def export_to_json(self):
         """Экспортирует данные в JSON-файл."""
-        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[("JSON files", "*.json")])
+        file_path = filedialog.asksaveasfilename(defaultextension=".json", filetypes=[
+            ("JSON files", "*.json"),
+            ("NDJSON files", "*.ndjson"),
+            ("Сжатый JSON", "*.json.gz"),
+            ("Сжатый NDJSON", "*.ndjson.gz"),
+        ])
         if file_path:
-            try:
-                db.export_data_to_json(file_path)
-                messagebox.showinfo("Успех", "Данные успешно экспортированы")
-            except Exception as e:
-                messagebox.showerror("Ошибка экспорта", str(e))
+            def show_result(written):
+                if written is None:
+                    messagebox.showinfo("Экспорт", "Экспорт отменён")
+                else:
+                    messagebox.showinfo("Успех", f"Данные успешно экспортированы ({written} записей)")
+
+            self.run_with_progress("Экспорт в JSON", "Экспорт данных...", db.export_data_to_json, file_path,
+                                   on_done=show_result)
 
 
 if __name__ == "__main__":
@@ -2,8 +2,9 @@ import db
 from gui import App
 
 if __name__=="__main__":
-    db.create_tables() # инициализация БД
+    db.migrate() # инициализация БД и обновление схемы до текущей версии
     app=App()
     app.mainloop()
+    db.close_connections() # закрываем пул соединений
 
-#git v1
\ No newline at end of file
+#git v1
@@ -1,20 +1,107 @@
 import re
+from functools import lru_cache
+
+# Значение города, если его не удалось извлечь из адреса
+UNKNOWN_CITY = "Неизвестно"
+
+# Признак того, что в части адреса указан город ("г." с учётом регистра, "город"/"гор." — без)
+_CITY_MARKER = re.compile(r"г\.|(?i:город|гор\.)")
+_CITY_SUFFIXES = frozenset(("г.", "город", "гор."))
+
+
+@lru_cache(maxsize=65536)
+def extract_city(address, max_depth=3):
+    """Извлекает город из адреса.
+
+    Просматривает не более max_depth первых частей адреса, разделённых запятыми:
+    часть вида "Краснодар г." или часть из одних букв считается городом.
+    Результат кэшируется: одинаковые адреса разбираются один раз.
+    """
+    if not address:
+        return UNKNOWN_CITY
+    for part in address.split(',')[:max_depth]:
+        part = part.strip()
+        # Сначала проверяем схему, когда "г." или "город" стоят после названия города
+        if _CITY_MARKER.search(part):
+            words = part.split()
+            if len(words) > 1 and words[-1].lower() in _CITY_SUFFIXES:
+                return words[-2]
+            return UNKNOWN_CITY
+        if part.isalpha():  # Если городской блок указан явно
+            return part
+    return UNKNOWN_CITY
+
+
+# Шаблоны проверки email и телефона компилируются один раз при импорте модуля
+_EMAIL_PATTERN = re.compile(r"[^\s@]+@[^\s@]+\.[^\s@]+")
+_PHONE_PATTERN = re.compile(r"^\+?\d+$")
+
+
+def validate_clients(emails, phones):
+    """Проверяет столбцы email и телефонов сразу для многих клиентов.
+
+    emails и phones — последовательности строк одинаковой длины (например, столбцы
+    пачки CSV). Возвращает список той же длины: None для корректной строки или текст
+    ошибок, как в Client.validate. Исключения не выбрасываются, поэтому проверка
+    больших пачек не тратит время на их создание и перехват.
+    """
+    email_match = _EMAIL_PATTERN.match
+    phone_match = _PHONE_PATTERN.match
+    errors = []
+    for email, phone in zip(emails, phones):
+        if email_match(email) and phone_match(phone):
+            errors.append(None)
+            continue
+        reasons = []
+        if not email_match(email):
+            reasons.append(f"Некорректный формат email: {email}")
+        if not phone_match(phone):
+            reasons.append(f"Некорректный формат телефона: {phone}")
+        errors.append("\n".join(reasons))
+    return errors
+
 
 class BaseModel:
+    """Базовый класс моделей.
+
+    Модели объявляют __slots__: у объектов нет словаря атрибутов, поэтому они занимают
+    меньше памяти и быстрее создаются при загрузке больших выборок. FIELDS — публичные
+    поля модели, по ним строится to_dict (скрытые атрибуты вроде _email в словарь не попадают).
+    """
+    __slots__ = ()
+    FIELDS = ()
+
     def to_dict(self):
-        """Преобразует атрибуты объекта в словарь."""
-        """Это простой базовый класс, обеспечивающий удобный способ преобразовывать экземпляры классов в представление 
-        словаря. Метод to_dict() возвращает содержимое объекта в виде словаря благодаря встроенному методу vars(), 
-        который извлекает атрибуты объекта."""
-        return vars(self)
+        """Преобразует публичные поля объекта в словарь."""
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    @classmethod
+    def row_factory(cls, cursor, row):
+        """row_factory для курсора sqlite3: строит объект модели сразу из кортежа строки (см. from_row)."""
+        return cls.from_row(row)
+
 
 class Client(BaseModel):
-    def __init__(self, name, email, phone, address, id=None):
+    __slots__ = ("id", "name", "_email", "phone", "address", "city")
+    FIELDS = ("id", "name", "email", "phone", "address", "city")
+
+    def __init__(self, name, email, phone, address, id=None, city=None):
         self.id = id
         self.name = name
         self._email = email  # Использование приватного атрибута для хранения почты
         self.phone = phone
         self.address = address
+        # Город хранится в базе; для нового клиента он извлекается из адреса
+        self.city = city if city is not None else extract_city(address)
+
+    @classmethod
+    def from_row(cls, row):
+        """Создаёт клиента из кортежа (id, name, email, phone, address, city) — порядок столбцов таблицы clients."""
+        client = cls.__new__(cls)
+        client.id, client.name, client._email, client.phone, client.address, client.city = row
+        if client.city is None:
+            client.city = extract_city(client.address)
+        return client
 
     """Свойство (@property)— это специальный механизм Python, позволяющий создавать контролируемые интерфейсы доступа 
     к атрибутам объекта. Вместо простого обращения к полям, свойства позволяют добавлять дополнительную логику 
@@ -39,7 +126,7 @@ class Client(BaseModel):
     @email.setter
     def email(self, value):
         """Устанавливает email с предварительной валидацией формата адреса электронной почты."""
-        if not re.match(r"[^\s@]+@[^\s@]+\.[^\s@]+", value):
+        if not _EMAIL_PATTERN.match(value):
             raise ValueError("Некорректный формат email")
         self._email = value
     """
@@ -53,13 +140,9 @@ class Client(BaseModel):
 
     def validate(self):
         """"Проверяет правильность заполнения полей (почта и телефон)."""
-        errors = []
-        if not re.match(r"[^\s@]+@[^\s@]+\.[^\s@]+", self.email):
-            errors.append(f"Некорректный формат email: {self.email}")
-        if not re.match(r"^\+?\d+$", self.phone):
-            errors.append(f"Некорректный формат телефона: {self.phone}")
+        errors = validate_clients([self.email], [self.phone])[0]
         if errors:
-            raise ValueError("\n".join(errors))
+            raise ValueError(errors)
         return True
 
     """
@@ -73,14 +156,29 @@ class Client(BaseModel):
     """
 
 class Product(BaseModel):
+    __slots__ = ("id", "name", "price")
+    FIELDS = __slots__
+
     def __init__(self, name, price, id=None):
         self.id = id
         self.name = name
         self.price = price
 
+    @classmethod
+    def from_row(cls, row):
+        """Создаёт товар из кортежа (id, name, price) — порядок столбцов таблицы products."""
+        product = cls.__new__(cls)
+        product.id, product.name, product.price = row
+        return product
+
 
 class Order(BaseModel):
-    def __init__(self, id, client_id, products, order_date, _total_cost=None, client_name="", items=""):
+    __slots__ = ("id", "client_id", "products", "order_date", "_total_cost", "client_name", "items",
+                 "items_count", "lines")
+    FIELDS = ("id", "client_id", "order_date", "client_name", "items", "items_count", "total_cost", "lines")
+
+    def __init__(self, id, client_id, products, order_date, _total_cost=None, client_name="", items="",
+                 items_count=0, lines=None):
         self.id = id
         self.client_id = client_id
         self.products = products
@@ -88,7 +186,39 @@ class Order(BaseModel):
         self._total_cost = _total_cost  # Скрытое поле для итоговой стоимости
         self.client_name = client_name  # Имя клиента
         self.items = items              # Форматированный список товаров
+        self.items_count = items_count  # Количество единиц товара в заказе
+        # Позиции заказа: (id товара, количество), по одной на товар.
+        # Если позиции не переданы, они собираются из списка товаров (повтор товара = +1 к количеству)
+        if lines is None:
+            lines = [(product.id, 1) for product in products]
+        self.lines = self.aggregate_lines(lines)
+
+    @classmethod
+    def from_row(cls, row):
+        """Создаёт сохранённый заказ из кортежа (id, client_id, order_date, client_name, items, total_cost, items_count).
+
+        Товары и позиции не загружаются: итоги заказа уже хранятся в самой записи.
+        """
+        order = cls.__new__(cls)
+        (order.id, order.client_id, order.order_date, order.client_name, order.items,
+         order._total_cost, order.items_count) = row
+        order.products = []
+        order.lines = []
+        return order
+
+    @staticmethod
+    def aggregate_lines(lines):
+        """Объединяет позиции с одинаковым товаром, суммируя количество (порядок первого появления сохраняется)."""
+        quantities = {}
+        for product_id, quantity in lines:
+            if not isinstance(quantity, int) or quantity < 1:
+                raise ValueError(f"Некорректное количество товара {product_id}: {quantity}")
+            quantities[product_id] = quantities.get(product_id, 0) + quantity
+        return list(quantities.items())
 
     @property
     def total_cost(self):
+        """Итоговая стоимость: сохранённая в базе или сумма цен переданных товаров."""
+        if self._total_cost is None and self.products:
+            return sum(product.price for product in self.products)
         return self._total_cost
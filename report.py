@@ -0,0 +1,211 @@
+"""Формирование отчётов без графического интерфейса.
+
+Для каждого периода и сегмента (всех клиентов или клиентов одного города) считаются
+топ клиентов и динамика продаж, один раз за запуск — география клиентов. Расчёты и
+отрисовка графиков выполняются в пуле процессов (по умолчанию по процессу на ядро) на
+бэкенде Agg; графики сохраняются в PNG/SVG, сводка — в summary.csv, top_clients.csv
+и summary.json выходного каталога.
+
+Примеры запуска из корня проекта:
+    python report.py reports
+    python report.py reports --period 2024-01-01:2024-03-31 --period 2024-04-01: \\
+        --segment Москва --top-cities 5 --format png svg
+"""
+import matplotlib
+
+# Отрисовка без окна: бэкенд выбирается до импорта модулей с графиками
+matplotlib.use("Agg")
+
+import argparse  # noqa: E402
+import csv  # noqa: E402
+import json  # noqa: E402
+import multiprocessing  # noqa: E402
+import os  # noqa: E402
+import re  # noqa: E402
+from concurrent.futures import ProcessPoolExecutor  # noqa: E402
+from datetime import date, datetime, timedelta  # noqa: E402
+
+from matplotlib.figure import Figure  # noqa: E402
+
+import analysis  # noqa: E402
+import db  # noqa: E402
+
+FORMATS = ("png", "svg")
+ALL_PERIOD = (None, None)
+ALL_CLIENTS = None
+
+
+def parse_period(text):
+    """Разбирает период 'С:ПО' (дни 'YYYY-MM-DD', обе границы включительно, любую можно опустить).
+
+    Возвращает (date_from, date_to) для db.get_daily_revenue: date_to — день после 'ПО'.
+    """
+    start, sep, end = text.partition(":")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"Период задаётся как С:ПО, получено: {text}")
+    try:
+        date_from = date.fromisoformat(start).isoformat() if start else None
+        date_to = (date.fromisoformat(end) + timedelta(days=1)).isoformat() if end else None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Некорректная дата в периоде: {text}")
+    if date_from is not None and date_to is not None and date_from >= date_to:
+        raise argparse.ArgumentTypeError(f"Начало периода позже конца: {text}")
+    return date_from, date_to
+
+
+def period_label(period):
+    """Имя периода для файлов и сводки: 'all', '2024-01-01_2024-03-31', '2024-04-01_' и т. п."""
+    date_from, date_to = period
+    if period == ALL_PERIOD:
+        return "all"
+    last_day = (date.fromisoformat(date_to) - timedelta(days=1)).isoformat() if date_to else ""
+    return f"{date_from or ''}_{last_day}"
+
+
+def segment_label(city):
+    """Имя сегмента для файлов: 'all' или название города без символов, недопустимых в имени файла."""
+    if city is ALL_CLIENTS:
+        return "all"
+    return re.sub(r"[^\w-]+", "_", city).strip("_") or "city"
+
+
+def save_figure(fig, out_dir, name, formats):
+    """Сохраняет фигуру в out_dir во всех форматах; возвращает имена файлов."""
+    files = []
+    for fmt in formats:
+        file_name = f"{name}.{fmt}"
+        fig.savefig(os.path.join(out_dir, file_name), format=fmt)
+        files.append(file_name)
+    return files
+
+
+def _init_worker(db_file):
+    """Настраивает процесс пула: база та же, что у родительского процесса."""
+    db.DB_FILE = db_file
+
+
+def build_segment_report(out_dir, period, city, formats, top_n):
+    """Считает отчёт по одному периоду и сегменту и рисует его график; возвращает сводку (dict)."""
+    date_from, date_to = period
+    name = f"dynamics_{period_label(period)}_{segment_label(city)}"
+    # Кэш аналитики досчитан в generate_reports до запуска пула: здесь только чтение
+    top_clients = db.get_top_clients(top_n, date_from, date_to, city, refresh=False)
+    daily_rev = analysis.get_daily_revenue(date_from, date_to, city, refresh=False)
+
+    charts = []
+    if not daily_rev.empty:
+        fig = analysis.plot_order_dynamics(daily_rev, fig=Figure(figsize=(10, 6)))
+        charts = save_figure(fig, out_dir, name, formats)
+    return {
+        "period": period_label(period),
+        "date_from": date_from,
+        "date_to": date_to,
+        "segment": "all" if city is ALL_CLIENTS else city,
+        "orders_count": int(daily_rev["orders_count"].sum()) if not daily_rev.empty else 0,
+        "revenue": round(float(daily_rev["total_cost"].sum()), 2) if not daily_rev.empty else 0.0,
+        "top_clients": [{"client_name": client, "total": round(total, 2)} for client, total in top_clients],
+        "charts": charts,
+    }
+
+
+def build_geography_report(out_dir, formats):
+    """Строит граф географии клиентов и сохраняет его; возвращает сводку (dict)."""
+    layout = analysis.client_geography_layout(backfill=False)
+    if layout is None:
+        return {"cities": 0, "charts": []}
+    fig = analysis.plot_client_geography_graph(layout, fig=Figure(figsize=(10, 8)))
+    G, _ = layout
+    return {"cities": G.number_of_nodes(), "charts": save_figure(fig, out_dir, "geography", formats)}
+
+
+def write_summary(out_dir, reports, geography):
+    """Записывает сводку отчётов в summary.json, summary.csv и top_clients.csv."""
+    with open(os.path.join(out_dir, "summary.json"), "w", encoding="utf-8") as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(timespec="seconds"),
+            "reports": reports,
+            "geography": geography,
+        }, f, ensure_ascii=False, indent=2)
+
+    with open(os.path.join(out_dir, "summary.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["period", "segment", "orders_count", "revenue", "top_client", "top_client_total", "charts"])
+        for report in reports:
+            top = report["top_clients"][0] if report["top_clients"] else {"client_name": "", "total": ""}
+            writer.writerow([report["period"], report["segment"], report["orders_count"], report["revenue"],
+                             top["client_name"], top["total"], " ".join(report["charts"])])
+
+    with open(os.path.join(out_dir, "top_clients.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["period", "segment", "rank", "client_name", "total"])
+        for report in reports:
+            for rank, top in enumerate(report["top_clients"], start=1):
+                writer.writerow([report["period"], report["segment"], rank, top["client_name"], top["total"]])
+
+
+def generate_reports(out_dir, periods=(ALL_PERIOD,), segments=(ALL_CLIENTS,), formats=("png",), top_n=5,
+                     workers=None):
+    """Формирует отчёты по всем сочетаниям периодов и сегментов и сводку по ним в out_dir.
+
+    periods — пары (date_from, date_to) как у db.get_daily_revenue, segments — города
+    клиентов (None — все клиенты). Каждое сочетание и география считаются отдельной
+    задачей в пуле из workers процессов (по умолчанию — по числу ядер). Возвращает
+    (список сводок по сочетаниям, сводка по географии).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    # Записи в базу делаются заранее, в одном процессе: процессы пула только читают
+    db.migrate()
+    db.backfill_client_cities()
+    db.refresh_analytics()
+    # Открытые соединения не должны переходить в дочерние процессы
+    db.close_connections()
+
+    jobs = [(period, city) for period in periods for city in segments]
+    workers = min(workers or os.cpu_count() or 1, len(jobs) + 1)
+    # spawn: процессы пула не наследуют потоки и состояние matplotlib родителя
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                             initializer=_init_worker, initargs=(db.DB_FILE,)) as pool:
+        geography = pool.submit(build_geography_report, out_dir, formats)
+        futures = [pool.submit(build_segment_report, out_dir, period, city, formats, top_n)
+                   for period, city in jobs]
+        reports = []
+        for future in futures:
+            report = future.result()
+            print(f"Отчёт {report['period']} / {report['segment']}: заказов {report['orders_count']}, "
+                  f"выручка {report['revenue']:.2f}")
+            reports.append(report)
+        geography = geography.result()
+
+    write_summary(out_dir, reports, geography)
+    return reports, geography
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir", help="каталог для графиков и сводки")
+    parser.add_argument("--db", default=db.DB_FILE, help="файл базы данных")
+    parser.add_argument("--period", dest="periods", action="append", type=parse_period, metavar="С:ПО",
+                        help="период отчёта 'YYYY-MM-DD:YYYY-MM-DD' (можно несколько; по умолчанию — всё время)")
+    parser.add_argument("--segment", dest="segments", action="append", metavar="ГОРОД",
+                        help="отдельный отчёт по клиентам города (можно несколько)")
+    parser.add_argument("--top-cities", type=int, default=0, metavar="N",
+                        help="добавить сегменты по N городам с наибольшим числом клиентов")
+    parser.add_argument("--format", dest="formats", nargs="+", choices=FORMATS, default=["png"],
+                        help="форматы графиков")
+    parser.add_argument("--top", type=int, default=5, help="сколько клиентов в топе")
+    parser.add_argument("--workers", type=int, default=None, help="число процессов (по умолчанию — по числу ядер)")
+    args = parser.parse_args(argv)
+
+    db.DB_FILE = args.db
+    segments = [ALL_CLIENTS] + (args.segments or [])
+    if args.top_cities > 0:
+        db.migrate()
+        db.backfill_client_cities()
+        segments += [city for city, _ in db.get_city_counts()[:args.top_cities] if city not in segments]
+    reports, _ = generate_reports(args.out_dir, args.periods or [ALL_PERIOD], segments, args.formats, args.top,
+                                  args.workers)
+    print(f"Отчётов: {len(reports)}, результаты в {os.path.abspath(args.out_dir)}")
+
+
+if __name__ == "__main__":
+    main()
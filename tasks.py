@@ -0,0 +1,99 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import db
+
+
+class Task:
+    """Фоновая задача, запущенная через TaskExecutor.
+
+    Объект передаётся в выполняемую функцию (аргумент task), чтобы она могла сообщать
+    о прогрессе и проверять, не отменил ли её пользователь. Оба метода безопасно
+    вызывать из рабочего потока.
+    """
+
+    def __init__(self, executor, on_progress=None):
+        self._executor = executor
+        self._cancelled = threading.Event()
+        self.on_progress = on_progress
+        self.future = None
+
+    def cancel(self):
+        """Просит задачу остановиться. Функция сама решает, где прерваться."""
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def report_progress(self, done, total=None):
+        """Передаёт прогресс (done из total; total=None — объём заранее неизвестен) в поток интерфейса."""
+        if self.on_progress is not None:
+            self._executor._results.put((self.on_progress, (done, total)))
+
+
+class TaskExecutor:
+    """Выполняет обращения к базе данных и аналитике вне потока Tk.
+
+    Функции запускаются в пуле потоков, а их результаты складываются в очередь,
+    которую главный цикл Tk опрашивает через after(). Поэтому колбэки on_done,
+    on_error и on_progress всегда вызываются в потоке интерфейса и могут свободно
+    обращаться к виджетам.
+    """
+
+    def __init__(self, root, max_workers=2, poll_interval=50):
+        self.root = root
+        self.poll_interval = poll_interval
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="app-worker")
+        self._results = queue.Queue()
+        self._tasks = set()
+        self._after_id = root.after(poll_interval, self._poll)
+
+    def submit(self, func, *args, on_done=None, on_error=None, on_progress=None, pass_task=False, **kwargs):
+        """Запускает func(*args, **kwargs) в фоновом потоке и возвращает объект Task.
+
+        on_done(result), on_error(exception) и on_progress(done, total) вызываются в потоке интерфейса.
+        При pass_task=True функция получает аргумент task для прогресса и отмены.
+        """
+        task = Task(self, on_progress)
+        if pass_task:
+            kwargs["task"] = task
+
+        def run():
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if on_error is not None:
+                    self._results.put((on_error, (e,)))
+            else:
+                if on_done is not None:
+                    self._results.put((on_done, (result,)))
+            finally:
+                # Соединение рабочего потока возвращается в общий пул
+                db.release_connection()
+                self._results.put((self._tasks.discard, (task,)))
+
+        self._tasks.add(task)
+        task.future = self._pool.submit(run)
+        return task
+
+    def _poll(self):
+        """Вызывает накопившиеся колбэки в потоке интерфейса и планирует следующий опрос."""
+        try:
+            while True:
+                callback, args = self._results.get_nowait()
+                try:
+                    callback(*args)
+                except Exception as e:
+                    # Ошибка в колбэке не должна останавливать опрос очереди
+                    print(f"Ошибка в обработчике фоновой задачи: {e}")
+        except queue.Empty:
+            pass
+        self._after_id = self.root.after(self.poll_interval, self._poll)
+
+    def shutdown(self):
+        """Отменяет незавершённые задачи и останавливает пул потоков."""
+        for task in list(self._tasks):
+            task.cancel()
+        self.root.after_cancel(self._after_id)
+        self._pool.shutdown(wait=False, cancel_futures=True)
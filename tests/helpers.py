@@ -0,0 +1,38 @@
+"""Общие заготовки тестов, работающих с базой данных."""
+import os
+import tempfile
+import unittest
+
+import db
+from models import Client, Product, Order
+
+
+class DbTestCase(unittest.TestCase):
+    """Базовый класс: каждый тест работает со своей временной базой данных."""
+
+    def setUp(self):
+        self._old_db_file = db.DB_FILE
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        db.DB_FILE = os.path.join(self._tmp_dir.name, "test_shop.db")
+        db.create_tables()
+
+    def tearDown(self):
+        db.close_connections()
+        db.DB_FILE = self._old_db_file
+        self._tmp_dir.cleanup()
+
+
+class ShopTestCase(DbTestCase):
+    """Временная база с двумя клиентами из разных городов, одним товаром и тремя заказами.
+
+    Иван Иванов (Москва): 2023-01-01, 100. Анна Смирнова (Казань): 2023-01-02, 300 и 100.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.ivan = db.add_client(Client("Иван Иванов", "ivan@example.com", "+79990000001", "Москва"))
+        self.anna = db.add_client(Client("Анна Смирнова", "anna@example.com", "+79990000002", "Казань"))
+        self.product = db.add_product(Product("Кабель", 100))
+        db.add_order(Order(None, self.ivan, [], "2023-01-01 10:00:00", lines=[(self.product, 1)]))
+        db.add_order(Order(None, self.anna, [], "2023-01-02 10:00:00", lines=[(self.product, 3)]))
+        db.add_order(Order(None, self.anna, [], "2023-01-02 12:00:00", lines=[(self.product, 1)]))
@@ -1,4 +1,13 @@
+import gc
 import unittest
+
+import pandas as pd
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import analysis
+from helpers import ShopTestCase
 from analysis import extract_city
 from analysis import sort_orders
 
@@ -68,6 +77,104 @@ class TestSortOrders(unittest.TestCase):
         self.assertListEqual(expected_ids, actual_ids)
 
 
+class TestOrderDynamics(unittest.TestCase):
+    def daily(self, days):
+        dates = pd.date_range("2022-01-01", periods=days, freq="D")
+        return pd.DataFrame({'order_date': dates.date, 'total_cost': 100.0, 'orders_count': 1})
+
+    def test_resample_picks_finest_fitting_period(self):
+        weekly, step = analysis.resample_revenue(self.daily(730), max_points=200)
+        self.assertEqual(analysis.REVENUE_FREQUENCIES[step][0], "W-MON")
+        self.assertLessEqual(len(weekly), 200)
+        self.assertEqual(weekly['total_cost'].sum(), 73000)
+        _, step = analysis.resample_revenue(self.daily(730), max_points=30)
+        self.assertEqual(analysis.REVENUE_FREQUENCIES[step][0], "MS")
+
+    def test_long_history_drawn_as_area(self):
+        fig = Figure(figsize=(10, 6), dpi=100)
+        analysis.plot_order_dynamics(self.daily(10), fig=fig)
+        self.assertEqual(len(fig.axes[0].patches), 10)
+        analysis.plot_order_dynamics(self.daily(3650), fig=fig)
+        ax = fig.axes[0]
+        self.assertEqual(len(ax.patches), 0)
+        self.assertLessEqual(len(ax.lines[0].get_xdata()), 1000 // analysis.PIXELS_PER_POINT)
+
+
+class TestSqlAnalytics(ShopTestCase):
+    def test_get_orders_df_typed_columns(self):
+        df = analysis.get_orders_df(chunk_size=2)
+        self.assertEqual(df['id'].tolist(), [1, 2, 3])
+        self.assertEqual(str(df['client_name'].dtype), 'category')
+        self.assertEqual(str(df['order_date'].dtype), 'datetime64[ns]')
+        self.assertEqual(df['total_cost'].dtype, 'float64')
+
+    def test_get_top_clients(self):
+        top = analysis.get_top_clients(1)
+        self.assertEqual(top.to_dict(), {"Анна Смирнова": 400})
+
+    def test_get_daily_revenue(self):
+        daily = analysis.get_daily_revenue()
+        self.assertEqual(daily['total_cost'].tolist(), [100, 400])
+        self.assertIsNotNone(analysis.plot_order_dynamics(daily))
+
+    def test_period_and_city_segments(self):
+        """Топ клиентов и выручка по дням считаются за период и по городу клиента."""
+        top = analysis.get_top_clients(5, date_from="2023-01-01", date_to="2023-01-02")
+        self.assertEqual(top.to_dict(), {"Иван Иванов": 100})
+        self.assertEqual(analysis.get_top_clients(5, city="Казань").to_dict(), {"Анна Смирнова": 400})
+        daily = analysis.get_daily_revenue(city="Казань")
+        self.assertEqual(daily['total_cost'].tolist(), [400])
+        self.assertEqual(daily['orders_count'].tolist(), [2])
+        self.assertTrue(analysis.get_daily_revenue("2023-01-02", None, "Москва").empty)
+
+    def test_client_geography_layout(self):
+        G, pos = analysis.client_geography_layout(clients_per_city=1)
+        self.assertEqual(G.nodes["Москва"]["count"], 1)
+        self.assertEqual(G.number_of_nodes(), 4)
+        self.assertEqual(set(pos), set(G.nodes))
+
+        G, pos = analysis.client_geography_layout(max_cities=1)
+        self.assertEqual(G.number_of_nodes(), 2)
+        self.assertEqual(G.nodes[analysis.OTHER_CITIES]["count"], 1)
+        self.assertIsNotNone(analysis.plot_client_geography_graph((G, pos)))
+
+    def test_chart_data_cached_by_watermark(self):
+        watermark, daily = analysis.load_order_dynamics()
+        self.assertEqual(watermark, 3)
+        self.assertIs(analysis.load_order_dynamics()[1], daily)
+
+        fig = analysis.plot_order_dynamics(daily)
+        bars = list(fig.axes[0].containers[0])
+        analysis.plot_order_dynamics(daily.assign(total_cost=daily['total_cost'] * 2), fig=fig)
+        # Повторная отрисовка тех же дней меняет высоты существующих столбцов
+        self.assertEqual(list(fig.axes[0].containers[0]), bars)
+        self.assertEqual(bars[1].get_height(), 800)
+
+    def test_repeated_renders_do_not_leak(self):
+        """100 переключений графиков на одной фигуре не накапливают оси и объекты matplotlib."""
+        fig = Figure()
+        canvas = FigureCanvasAgg(fig)
+        daily = analysis.get_daily_revenue()
+        layout = analysis.client_geography_layout()
+
+        def render(i):
+            if i % 4 == 3:
+                analysis.plot_client_geography_graph(layout, fig=fig)
+            else:
+                analysis.plot_order_dynamics(daily, fig=fig)
+            canvas.draw()
+
+        def live_artists():
+            gc.collect()
+            return sum(isinstance(obj, Artist) for obj in gc.get_objects())
+
+        for i in range(8):
+            render(i)
+        before = live_artists()
+        for i in range(100):
+            render(i)
+        self.assertEqual(len(fig.axes), 1)
+        self.assertEqual(live_artists(), before)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,530 @@
+import csv
+import gzip
+import json
+import os
+import sqlite3
+import threading
+import time
+import unittest
+
+import db
+from helpers import DbTestCase
+from models import Client, Product, Order
+
+
+class TestConnectionPool(DbTestCase):
+    def test_connection_is_reused_within_thread(self):
+        """Повторные вызовы в одном потоке возвращают одно и то же соединение."""
+        self.assertIs(db.get_connection(), db.get_connection())
+
+    def test_each_thread_gets_own_connection(self):
+        """Разные потоки получают разные соединения."""
+        main_conn = db.get_connection()
+        other = []
+        thread = threading.Thread(target=lambda: other.append(db.get_connection()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(main_conn, other[0])
+
+    def test_released_connection_is_reused(self):
+        """Освобождённое соединение возвращается в пул и достаётся следующему потоку."""
+        conns = []
+
+        def worker():
+            conns.append(db.get_connection())
+            db.release_connection()
+
+        for _ in range(2):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        self.assertIs(conns[0], conns[1])
+
+    def test_pragmas_applied(self):
+        """Соединение открывается в режиме WAL с настроенными параметрами."""
+        conn = db.get_connection()
+        self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(conn.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+        self.assertEqual(conn.execute("PRAGMA temp_store").fetchone()[0], 2)  # MEMORY
+
+    def test_crud_through_pool(self):
+        """Функции модуля db работают через общее соединение."""
+        client_id = db.add_client(Client("Иван", "ivan@example.com", "+79990000000", "Москва"))
+        clients = db.get_all_clients()
+        self.assertEqual([c.id for c in clients], [client_id])
+
+
+class TestImportCsv(DbTestCase):
+    def write_csv(self, rows):
+        path = os.path.join(self._tmp_dir.name, "clients.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=["name", "email", "phone", "address"])
+            writer.writeheader()
+            writer.writerows(rows)
+        return path
+
+    def test_import_reports_counts(self):
+        """Импорт возвращает количество добавленных, пропущенных и ошибочных строк."""
+        db.add_client(Client("Старый", "old@example.com", "+79990000000", "Омск"))
+        path = self.write_csv([
+            {"name": "Иван", "email": "ivan@example.com", "phone": "+79990000001", "address": "Москва"},
+            {"name": "Дубль", "email": "ivan@example.com", "phone": "+79990000002", "address": "Москва"},
+            {"name": "Старый", "email": "old@example.com", "phone": "+79990000003", "address": "Омск"},
+            {"name": "Плохой", "email": "bad-email", "phone": "+79990000004", "address": "Омск"},
+            {"name": "Анна", "email": "anna@example.com", "phone": "+79990000005", "address": "Казань"},
+        ])
+        report = db.import_data_from_csv(path, batch_size=2)
+        self.assertEqual((report.inserted, report.skipped, report.failed), (2, 2, 1))
+        self.assertEqual(sorted(line for line, _ in report.errors), [3, 4, 5])
+        emails = sorted(c.email for c in db.get_all_clients())
+        self.assertEqual(emails, ["anna@example.com", "ivan@example.com", "old@example.com"])
+
+    def test_columns_by_header(self):
+        """Столбцы берутся по заголовку в любом порядке; пустые строки пропускаются, короткие — ошибка."""
+        path = os.path.join(self._tmp_dir.name, "clients.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write("email,comment,name,address,phone\n"
+                    "ivan@example.com,-,Иван,Москва,+79990000001\n"
+                    "\n"
+                    "anna@example.com,-,Анна\n")
+        report = db.import_data_from_csv(path)
+        self.assertEqual((report.inserted, report.failed), (1, 1))
+        self.assertEqual(report.errors, [(4, "Отсутствуют поля: phone, address")])
+        client, = db.get_all_clients()
+        self.assertEqual((client.name, client.phone, client.address), ("Иван", "+79990000001", "Москва"))
+
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            f.write("name,email\nПётр,petr@example.com\n")
+        report = db.import_data_from_csv(path)
+        self.assertEqual(report.errors, [(2, "Отсутствуют поля: phone, address")])
+
+
+class TestExportJson(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        client_id = db.add_client(Client("Иван", "ivan@example.com", "+79990000001", "Москва"))
+        mouse = Product("Мышь", 1500, id=db.add_product(Product("Мышь", 1500)))
+        keyboard = Product("Клавиатура", 4500, id=db.add_product(Product("Клавиатура", 4500)))
+        db.add_order(Order(None, client_id, [mouse, keyboard], "2024-01-01 10:00:00"))
+        db.add_order(Order(None, client_id, [keyboard], "2024-01-02 10:00:00"))
+
+    def test_export_json_includes_orders(self):
+        """JSON содержит клиентов, товары и заказы с позициями."""
+        path = os.path.join(self._tmp_dir.name, "export.json")
+        db.export_data_to_json(path, chunk_size=1)
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        self.assertEqual([c["email"] for c in data["clients"]], ["ivan@example.com"])
+        self.assertEqual([p["name"] for p in data["products"]], ["Мышь", "Клавиатура"])
+        self.assertEqual([[i["product_id"] for i in o["items"]] for o in data["orders"]], [[1, 2], [2]])
+
+    def test_export_ndjson_gzip(self):
+        """NDJSON с gzip: по одной записи на строку."""
+        path = os.path.join(self._tmp_dir.name, "export.ndjson.gz")
+        db.export_data_to_json(path)
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([r["type"] for r in records], ["client", "product", "product", "order", "order"])
+
+
+class TestPagination(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        for i, price in enumerate([9.0, 100.0, 25.5, 9.0, 40.0]):
+            db.add_product(Product(f"Товар {i}", price))
+
+    def collect(self, **kwargs):
+        """Проходит по всем страницам и возвращает id в порядке выдачи."""
+        ids, cursor = [], None
+        while True:
+            page, cursor = db.get_products_page(after=cursor, page_size=2, **kwargs)
+            ids.extend(p.id for p in page)
+            if cursor is None:
+                return ids
+
+    def test_keyset_pages_sorted_by_price(self):
+        """Страницы идут без пропусков и повторов, цены сравниваются как числа."""
+        self.assertEqual(self.collect(sort="price"), [1, 4, 3, 5, 2])
+        self.assertEqual(self.collect(sort="price", descending=True), [2, 5, 3, 4, 1])
+
+    def test_backward_page(self):
+        """Страница перед курсором возвращается в прямом порядке."""
+        page, cursor = db.get_products_page(sort="price", before=(40.0, 5), page_size=2)
+        self.assertEqual([p.id for p in page], [4, 3])
+        self.assertEqual(cursor, (9.0, 4))
+        page, cursor = db.get_products_page(sort="price", before=cursor, page_size=2)
+        self.assertEqual(([p.id for p in page], cursor), ([1], None))
+
+    def test_filters(self):
+        """Фильтры ограничивают выборку."""
+        self.assertEqual(self.collect(filters={"price__gte": 25.5}), [2, 3, 5])
+        self.assertEqual(self.collect(filters={"name__prefix": "Товар 1"}), [2])
+
+    def test_orders_without_client(self):
+        """Заказы без клиента не теряются при листании; имя клиента в заказе следует за переименованием."""
+        ivan = db.add_client(Client("Иван", "ivan@example.com", "+79990000001", "Москва"))
+        anna = db.add_client(Client("Анна", "anna@example.com", "+79990000002", "Казань"))
+        product = db.add_product(Product("Кабель", 100))
+        for client_id in (ivan, None, anna, None, None):
+            db.add_order(Order(None, client_id, [], "2024-01-01 10:00:00", lines=[(product, 1)]))
+
+        def collect(**kwargs):
+            ids, cursor = [], None
+            while True:
+                page, cursor = db.get_orders_page(after=cursor, page_size=2, **kwargs)
+                ids.extend(o.id for o in page)
+                if cursor is None:
+                    return ids
+
+        self.assertEqual(collect(sort="client_name"), [2, 4, 5, 3, 1])
+        self.assertEqual(collect(sort="client_name", descending=True), [1, 3, 5, 4, 2])
+        self.assertEqual(collect(filters={"client_id": anna}), [3])
+        with self.assertRaises(ValueError):
+            db.get_orders_page(sort="client_id")
+
+        with db.get_connection() as conn:
+            conn.execute("UPDATE clients SET name = 'Борис' WHERE id = ?", (anna,))
+        page, _ = db.get_orders_page(filters={"client_id": anna})
+        self.assertEqual(page[0].client_name, "Борис")
+
+    def test_unknown_sort_column(self):
+        """Столбцы вне белого списка не попадают в запрос."""
+        with self.assertRaises(ValueError):
+            db.get_products_page(sort="price; DROP TABLE products")
+
+
+class TestOrderTotals(DbTestCase):
+    def test_totals_stored_with_price_snapshot(self):
+        """Итоги заказа сохраняются при оформлении и не меняются вместе с ценой товара."""
+        client_id = db.add_client(Client("Иван", "ivan@example.com", "+79990000001", "Москва"))
+        mouse = Product("Мышь", 1500, id=db.add_product(Product("Мышь", 1500)))
+        keyboard = Product("Клавиатура", 4500, id=db.add_product(Product("Клавиатура", 4500)))
+        db.add_order(Order(None, client_id, [mouse, keyboard], "2024-01-01 10:00:00"))
+        with db.get_connection() as conn:
+            conn.execute("UPDATE products SET price = 1 WHERE id = ?", (mouse.id,))
+        order, = db.get_all_orders()
+        self.assertEqual((order.total_cost, order.items_count), (6000, 2))
+        self.assertEqual(order.items, "Мышь: 1,Клавиатура: 1")
+
+    def test_order_lines_aggregated(self):
+        """Повторяющиеся товары объединяются в одну позицию с суммарным количеством."""
+        client_id = db.add_client(Client("Иван", "ivan@example.com", "+79990000001", "Москва"))
+        mouse_id = db.add_product(Product("Мышь", 1500))
+        cable_id = db.add_product(Product("Кабель", 100))
+        order_id = db.add_order(Order(None, client_id, [], "2024-01-01 10:00:00",
+                                      lines=[(mouse_id, 1)] * 20 + [(cable_id, 3), (mouse_id, 2)]))
+        rows = db.get_connection().execute(
+            "SELECT product_id, quantity FROM order_products WHERE order_id = ? ORDER BY id", (order_id,)
+        ).fetchall()
+        self.assertEqual([tuple(row) for row in rows], [(mouse_id, 22), (cable_id, 3)])
+        order, = db.get_all_orders()
+        self.assertEqual((order.total_cost, order.items_count), (22 * 1500 + 300, 25))
+
+    def test_unknown_product_rolls_back(self):
+        """Заказ с несуществующим товаром не сохраняется."""
+        with self.assertRaises(ValueError):
+            db.add_order(Order(None, None, [], "2024-01-01", lines=[(999, 1)]))
+        self.assertEqual(db.get_all_orders(), [])
+
+    def test_old_database_is_upgraded(self):
+        """В базе без сохранённых итогов столбцы добавляются и заполняются по текущим ценам."""
+        db.close_connections()
+        os.remove(db.DB_FILE)
+        with sqlite3.connect(db.DB_FILE) as conn:
+            conn.executescript("""
+                CREATE TABLE clients (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+                                      email TEXT NOT NULL UNIQUE, phone TEXT NOT NULL, address TEXT);
+                CREATE TABLE products (id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, price REAL NOT NULL);
+                CREATE TABLE orders (id INTEGER PRIMARY KEY AUTOINCREMENT, client_id INTEGER, order_date TEXT NOT NULL);
+                CREATE TABLE order_products (id INTEGER PRIMARY KEY AUTOINCREMENT, order_id INTEGER,
+                                             product_id INTEGER, quantity INTEGER DEFAULT 1);
+                INSERT INTO clients VALUES (1, 'Иван', 'ivan@example.com', '+79990000001', 'Москва');
+                INSERT INTO products VALUES (1, 'Мышь', 1500);
+                INSERT INTO orders VALUES (1, 1, '2024-01-01');
+                INSERT INTO order_products VALUES (1, 1, 1, 3);
+            """)
+        conn.close()
+        db.create_tables()
+        order, = db.get_all_orders()
+        self.assertEqual((order.total_cost, order.items_count, order.items), (4500, 3, "Мышь: 3"))
+
+    def test_large_old_database_is_upgraded_quickly(self):
+        """Итоги заказов старой базы заполняются по индексу order_products(order_id), а не перебором позиций."""
+        orders = 4000
+        db.close_connections()
+        os.remove(db.DB_FILE)
+        with sqlite3.connect(db.DB_FILE) as conn:
+            db.MIGRATIONS[0](conn)
+            conn.execute("INSERT INTO products VALUES (1, 'Мышь', 1500);")
+            conn.executemany("INSERT INTO orders (id, client_id, order_date) VALUES (?, NULL, '2024-01-01');",
+                             ((i,) for i in range(1, orders + 1)))
+            conn.executemany("INSERT INTO order_products (order_id, product_id, quantity) VALUES (?, 1, 1);",
+                             ((i % orders + 1,) for i in range(3 * orders)))
+        conn.close()
+        start = time.perf_counter()
+        db.migrate()
+        # Без индекса каждая строка orders перебирает все позиции: десятки секунд вместо долей секунды
+        self.assertLess(time.perf_counter() - start, 3)
+        order = db.get_connection().execute("SELECT total_cost, items_count FROM orders WHERE id = 1;").fetchone()
+        self.assertEqual(tuple(order), (4500, 3))
+
+
+class TestMigrations(DbTestCase):
+    def old_database(self, version):
+        """Заменяет базу новой с версией схемы version и двумя клиентами; возвращает соединение."""
+        db.close_connections()
+        os.remove(db.DB_FILE)
+        conn = db.get_connection()
+        with conn:
+            for migration in db.MIGRATIONS[:version]:
+                migration(conn)
+            conn.executemany("INSERT INTO clients (name, email, phone) VALUES (?, ?, ?);", [
+                ("Иван Петров", "ivan@example.com", "+79990000001"),
+                ("Анна Иванова", "anna@example.com", "+79990000002"),
+            ])
+            conn.execute(f"PRAGMA user_version = {version};")
+        return conn
+
+    def query_plan(self, query, params=()):
+        rows = db.get_connection().execute("EXPLAIN QUERY PLAN " + query, params).fetchall()
+        return " | ".join(row["detail"] for row in rows)
+
+    def test_schema_version_and_idempotency(self):
+        """После миграций версия схемы равна числу миграций, повторный запуск ничего не меняет."""
+        self.assertEqual(db.get_schema_version(), len(db.MIGRATIONS))
+        self.assertEqual(db.migrate(), len(db.MIGRATIONS))
+
+    def test_main_queries_use_indexes(self):
+        """Основные запросы по заказам читают данные через индексы, а не полным перебором."""
+        self.assertIn("USING INDEX idx_order_products_order_id",
+                      self.query_plan("SELECT * FROM order_products WHERE order_id = ?", (1,)))
+        self.assertIn("USING INDEX idx_order_products_product_id",
+                      self.query_plan("SELECT * FROM order_products WHERE product_id = ?", (1,)))
+        self.assertRegex(self.query_plan("SELECT * FROM orders WHERE client_id = ?", (1,)),
+                         "USING INDEX idx_orders_client_(id|total)")
+        self.assertRegex(self.query_plan("SELECT * FROM orders WHERE order_date >= ? AND order_date < ?",
+                                         ("2024-01-01", "2024-02-01")),
+                         "USING INDEX idx_orders_(order_date|date_total)")
+        self.assertIn("USING COVERING INDEX idx_orders_client_total",
+                      self.query_plan("SELECT client_id, SUM(total_cost) FROM orders GROUP BY client_id"))
+        # Сортировка страниц заказов по имени клиента идёт по индексу, без временного B-дерева
+        plan = self.query_plan(f"SELECT *, IFNULL(client_name, '') AS sort_key FROM {db._ORDERS_PAGE_SOURCE}"
+                               " ORDER BY IFNULL(client_name, ''), id LIMIT ?", (101,))
+        self.assertIn("USING INDEX idx_orders_client_name", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
+        plan = self.query_plan(db._UPDATE_ORDER_TOTALS + " WHERE id = ?", (1,))
+        self.assertIn("USING INDEX idx_order_products_order_id", plan)
+        self.assertNotIn("SCAN op", plan)
+
+
+    def test_search_index_filled_in_background(self):
+        """Индексы поиска создаются пустыми, строки старой базы добавляет backfill_search_indexes."""
+        conn = self.old_database(7)
+        db.migrate()
+        self.assertEqual(db.search_clients("иван"), [])
+
+        # Изменение и удаление ещё не проиндексированных строк не трогают индекс
+        with conn:
+            conn.execute("UPDATE clients SET name = 'Пётр Иванов' WHERE email = 'ivan@example.com';")
+            conn.execute("DELETE FROM clients WHERE email = 'anna@example.com';")
+        db.add_client(Client("Иван Сидоров", "sidorov@example.com", "+79990000003", "Тула"))
+        self.assertEqual(db.backfill_search_indexes(batch_size=1), 2)
+        self.assertEqual(db.backfill_search_indexes(), 0)
+        self.assertEqual(sorted(c.name for c in db.search_clients("иван")), ["Иван Сидоров", "Пётр Иванов"])
+
+        # Дальше индекс поддерживают триггеры
+        with conn:
+            conn.execute("UPDATE clients SET name = 'Пётр Смирнов' WHERE email = 'ivan@example.com';")
+        self.assertEqual([c.name for c in db.search_clients("иван")], ["Иван Сидоров"])
+        conn.execute("INSERT INTO clients_fts (clients_fts, rank) VALUES ('integrity-check', 1);")
+
+    def test_clients_index_rebuilt_after_migration_11(self):
+        """Без триггера вставки (миграция 11) клиенты в обход приложения не индексировались: индекс строится заново."""
+        conn = self.old_database(11)
+        self.assertEqual(db.search_clients("иван"), [])
+        db.migrate()
+        db.backfill_search_indexes()
+        with conn:
+            conn.execute("UPDATE clients SET name = 'Анна Смирнова' WHERE email = 'anna@example.com';")
+        self.assertEqual([c.name for c in db.search_clients("иван")], ["Иван Петров"])
+        conn.execute("INSERT INTO clients_fts (clients_fts, rank) VALUES ('integrity-check', 1);")
+
+
+class TestCatalog(DbTestCase):
+    def test_catalog_updated_incrementally(self):
+        """Записи читаются по ключу один раз, сохранённые добавляются в справочник без перечитывания."""
+        catalog = db.get_catalog()
+        mouse_id = db.add_product(Product("Мышь", 1500))
+        client_id = db.add_client(Client("Иван", "ivan@example.com", "+79990000001", "Москва"))
+        with db.get_connection() as conn:
+            conn.execute("UPDATE products SET price = 1 WHERE id = ?", (mouse_id,))
+        # Записи, сохранённые через приложение, уже в справочнике: база не читается
+        self.assertEqual(catalog.product(mouse_id).price, 1500)
+        self.assertEqual(catalog.client(client_id).email, "ivan@example.com")
+
+        catalog.invalidate()
+        self.assertEqual(catalog.product(mouse_id).price, 1)
+        self.assertIsNone(catalog.client(client_id + 1))
+
+    def test_import_invalidates_clients(self):
+        catalog = db.get_catalog()
+        client_id = db.add_client(Client("Иван", "ivan@example.com", "+79990000001", "Москва"))
+        with db.get_connection() as conn:
+            conn.execute("UPDATE clients SET name = 'Иван Петров' WHERE id = ?", (client_id,))
+        self.assertEqual(catalog.client(client_id).name, "Иван")
+        csv_path = os.path.join(self._tmp_dir.name, "clients.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            f.write("name,email,phone,address\nАнна,anna@example.com,+79990000002,Казань\n")
+        db.import_data_from_csv(csv_path)
+        self.assertEqual(catalog.client(client_id).name, "Иван Петров")
+        self.assertEqual(catalog.client(client_id + 1).name, "Анна")
+
+
+class TestSearch(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        db.add_client(Client("Иван Петров", "ivan@example.com", "+79990000001", "Москва"))
+        db.add_client(Client("Анна Иванова", "anna@mail.ru", "+79161234567", "Казань"))
+        db.add_product(Product("Ноутбук игровой", 90000))
+        db.add_product(Product("Мышь", 1500))
+
+    def names(self, items):
+        return sorted(item.name for item in items)
+
+    def test_prefix_search_over_name_email_phone(self):
+        self.assertEqual(self.names(db.search_clients("иван")), ["Анна Иванова", "Иван Петров"])
+        self.assertEqual(self.names(db.search_clients("Ива пет")), ["Иван Петров"])
+        self.assertEqual(self.names(db.search_clients("mail")), ["Анна Иванова"])
+        self.assertEqual(self.names(db.search_clients("7916")), ["Анна Иванова"])
+        self.assertEqual(self.names(db.search_products("ноут")), ["Ноутбук игровой"])
+        self.assertEqual(len(db.search_clients("", limit=1)), 1)
+        # Служебный синтаксис FTS5 во вводе не ломает запрос
+        self.assertEqual(db.search_clients('"OR* (иван'), db.search_clients("OR иван"))
+
+    def test_index_follows_table_changes(self):
+        conn = db.get_connection()
+        conn.execute("UPDATE clients SET name = 'Пётр Сидоров' WHERE email = 'ivan@example.com';")
+        conn.execute("DELETE FROM products WHERE name = 'Мышь';")
+        conn.commit()
+        self.assertEqual(self.names(db.search_clients("сидор")), ["Пётр Сидоров"])
+        self.assertEqual(self.names(db.search_clients("иван")), ["Анна Иванова"])
+        self.assertEqual(db.search_products("мышь"), [])
+
+    def test_imported_clients_are_indexed(self):
+        csv_path = os.path.join(self._tmp_dir.name, "clients.csv")
+        with open(csv_path, "w", newline="", encoding="utf-8") as f:
+            f.write("name,email,phone,address\n"
+                    "Пётр Сидоров,petr@example.com,+79990000003,Казань\n"
+                    "Ольга Петрова,olga@example.com,+79990000004,Москва\n")
+        db.import_data_from_csv(csv_path, batch_size=1)
+        # Импортированные клиенты попадают в индекс при дозаполнении, изменять их можно и до него
+        self.assertEqual(db.search_clients("сидор"), [])
+        db.get_connection().execute("UPDATE clients SET address = 'Тула' WHERE email = 'olga@example.com';")
+        db.add_client(Client("Сидор Кузьмин", "sidor@example.com", "+79990000005", "Тула"))
+        self.assertEqual(db.backfill_search_indexes(), 3)
+        self.assertEqual(self.names(db.search_clients("сидор")), ["Пётр Сидоров", "Сидор Кузьмин"])
+        self.assertEqual(self.names(db.search_clients("петров")), ["Иван Петров", "Ольга Петрова"])
+
+    def test_rows_inserted_directly_are_indexed(self):
+        """Клиенты, добавленные в обход приложения, находятся поиском и изменяются без повреждения индекса."""
+        conn = db.get_connection()
+        with conn:
+            conn.execute("INSERT INTO clients (name, email, phone) VALUES ('Пётр Сидоров', 'petr@example.com', '+7');")
+        with conn:
+            conn.execute("UPDATE clients SET name = 'Пётр Кузьмин' WHERE email = 'petr@example.com';")
+        self.assertEqual(self.names(db.search_clients("кузьм")), ["Пётр Кузьмин"])
+        self.assertEqual(db.search_clients("сидор"), [])
+        # integrity-check падает, если индекс расходится с таблицей
+        conn.execute("INSERT INTO clients_fts (clients_fts, rank) VALUES ('integrity-check', 1);")
+
+    def test_paginated_search_with_filters(self):
+        ivan = db.search_clients("иван петров")[0].id
+        anna = db.search_clients("анна")[0].id
+        laptop, mouse = (p.id for p in sorted(db.search_products(""), key=lambda p: p.id))
+        db.add_order(Order(None, ivan, [], "2024-01-01 10:00:00", lines=[(mouse, 1)]))
+        db.add_order(Order(None, anna, [], "2024-01-02 11:00:00", lines=[(laptop, 1)]))
+        db.add_order(Order(None, anna, [], "2024-01-03 12:00:00", lines=[(mouse, 2)]))
+
+        def order_ids(search=None, **conditions):
+            orders, _ = db.get_orders_page(filters=db.order_filters(**conditions), search=search)
+            return [order.id for order in orders]
+
+        self.assertEqual(order_ids("мышь"), [1, 3])
+        self.assertEqual(order_ids("анна"), [2, 3])
+        self.assertEqual(order_ids("мышь", client_id=anna), [3])
+        self.assertEqual(order_ids(date_from="2024-01-02", date_to="2024-01-02"), [2])
+        self.assertEqual(order_ids(min_total=2000, max_total=5000), [3])
+
+        page, cursor = db.get_clients_page(search="иван", sort="name", page_size=1)
+        self.assertEqual([c.name for c in page], ["Анна Иванова"])
+        page, cursor = db.get_clients_page(search="иван", sort="name", page_size=1, after=cursor)
+        self.assertEqual([c.name for c in page], ["Иван Петров"])
+        self.assertIsNone(cursor)
+
+
+class TestClientCity(DbTestCase):
+    def test_city_stored_and_backfilled(self):
+        """Город сохраняется при добавлении клиента, а у старых строк заполняется отдельно."""
+        db.add_client(Client("Иван", "ivan@example.com", "+79990000001", "Краснодар г., ул. Пушкина, 12"))
+        db.add_client(Client("Анна", "anna@example.com", "+79990000002", "Москва, ул. Ленина, д. 1"))
+        db.add_client(Client("Олег", "oleg@example.com", "+79990000003", "Москва"))
+        self.assertEqual(db.get_city_counts(), [("Москва", 2), ("Краснодар", 1)])
+
+        conn = db.get_connection()
+        conn.execute("UPDATE clients SET city = NULL;")
+        conn.commit()
+        self.assertEqual(db.backfill_client_cities(batch_size=2), 3)
+        self.assertEqual(db.backfill_client_cities(), 0)
+        self.assertEqual(db.get_city_counts(), [("Москва", 2), ("Краснодар", 1)])
+        self.assertEqual(sorted(db.get_city_clients_sample("Москва", 5)), ["Анна", "Олег"])
+
+        plan = " | ".join(row["detail"] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT name FROM clients WHERE city = ?", ("Москва",)))
+        self.assertIn("USING INDEX idx_clients_city", plan)
+
+
+class TestAggregates(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        ivan = db.add_client(Client("Иван", "ivan@example.com", "+79990000001", "Москва"))
+        anna = db.add_client(Client("Анна", "anna@example.com", "+79990000002", "Казань"))
+        cheap = db.add_product(Product("Кабель", 100))
+        costly = db.add_product(Product("Ноутбук", 50000))
+        db.add_order(Order(None, ivan, [], "2024-01-01 10:00:00", lines=[(cheap, 2)]))
+        db.add_order(Order(None, ivan, [], "2024-01-01 18:00:00", lines=[(cheap, 1)]))
+        db.add_order(Order(None, anna, [], "2024-01-03 12:00:00", lines=[(costly, 1)]))
+
+    def test_top_clients(self):
+        """Топ клиентов считается в SQL и ограничивается N строками."""
+        self.assertEqual(db.get_top_clients(5), [("Анна", 50000), ("Иван", 300)])
+        self.assertEqual(db.get_top_clients(1), [("Анна", 50000)])
+
+    def test_top_clients_skip_orders_without_client(self):
+        """Заказы без клиента не дают строку (None, сумма) в топе — ни из кэша, ни с фильтрами."""
+        db.add_order(Order(None, None, [], "2024-01-01 12:00:00", lines=[(2, 3)]))
+        self.assertEqual(db.get_top_clients(5), [("Анна", 50000), ("Иван", 300)])
+        self.assertEqual(db.get_top_clients(5, date_from="2024-01-01", date_to="2024-01-02"), [("Иван", 300)])
+
+    def test_daily_revenue(self):
+        """Выручка группируется по календарным дням с учётом границ периода."""
+        self.assertEqual(db.get_daily_revenue(), [("2024-01-01", 300, 2), ("2024-01-03", 50000, 1)])
+        self.assertEqual(db.get_daily_revenue(date_from="2024-01-02"), [("2024-01-03", 50000, 1)])
+
+    def test_analytics_cache_is_incremental(self):
+        """Кэш аналитики дополняется только новыми заказами и пересобирается по запросу."""
+        self.assertEqual(db.refresh_analytics(), 3)
+        ivan = db.get_clients_page(filters={"name": "Иван"})[0][0].id
+        db.add_order(Order(None, ivan, [], "2024-01-03 09:00:00", lines=[(1, 5)]))
+        self.assertEqual(db.get_daily_revenue(), [("2024-01-01", 300, 2), ("2024-01-03", 50500, 2)])
+        self.assertEqual(db.get_top_clients(5), [("Анна", 50000), ("Иван", 800)])
+        self.assertEqual(db.refresh_analytics(), 4)
+
+        # Изменение в обход приложения учитывается только при полной пересборке
+        db.get_connection().execute("UPDATE orders SET total_cost = 0 WHERE client_id = ?;", (ivan,))
+        db.get_connection().commit()
+        db.refresh_analytics(rebuild=True)
+        self.assertEqual(db.get_top_clients(5), [("Анна", 50000), ("Иван", 0)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import subprocess
+import sys
+import unittest
+
+import db
+import gui
+from helpers import DbTestCase
+from models import Client, Product, Order
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class TestStartup(unittest.TestCase):
+    def test_gui_import_is_light(self):
+        """Импорт gui не загружает аналитику: pandas, matplotlib и networkx нужны только на вкладке анализа."""
+        result = subprocess.run(
+            [sys.executable, "-c", "import sys, gui; print(' '.join(sorted(m for m in "
+                                   "('analysis', 'pandas', 'matplotlib', 'networkx') if m in sys.modules)))"],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        )
+        self.assertEqual(result.stdout.strip(), "")
+
+
+class FakeTree:
+    """Минимальная замена ttk.Treeview в памяти: строки, заголовки и прокрутка."""
+
+    def __init__(self, columns):
+        self.rows = []  # iid в порядке отображения
+        self.headings = {column: column for column in columns}
+        self.inserted = []  # iid, добавленные в конец, в порядке добавления
+
+    def __getitem__(self, key):
+        return tuple(self.headings) if key == "columns" else None
+
+    def configure(self, **kwargs):
+        pass
+
+    def get_children(self):
+        return tuple(self.rows)
+
+    def delete(self, *iids):
+        self.rows = [iid for iid in self.rows if iid not in iids]
+
+    def insert(self, parent, index, iid, values):
+        if index == "end":
+            self.rows.append(iid)
+            self.inserted.append(iid)
+        else:
+            self.rows.insert(index, iid)
+
+    def exists(self, iid):
+        return iid in self.rows
+
+    def heading(self, column, option=None, text=None):
+        if text is None:
+            return self.headings[column]
+        self.headings[column] = text
+
+    def yview(self):
+        return 0.0, 1.0
+
+    def yview_moveto(self, fraction):
+        pass
+
+
+class FakeScrollbar:
+    def set(self, first, last):
+        pass
+
+
+class TestLazyTreeview(DbTestCase):
+    def setUp(self):
+        super().setUp()
+        clients = [db.add_client(Client(f"Клиент {i:02d}", f"client{i}@example.com", "+79990000001", "Москва"))
+                   for i in range(10)]
+        product = db.add_product(Product("Кабель", 100))
+        for i in range(60):
+            # Каждый пятый заказ без клиента
+            client_id = None if i % 5 == 0 else clients[(i * 7) % 10]
+            db.add_order(Order(None, client_id, [], f"2024-01-{1 + i % 28:02d} 10:00:00",
+                               lines=[(product, 1 + i % 4)]))
+        self.tree = FakeTree(("id", "client", "date", "cost"))
+        self.view = gui.LazyTreeview(self.tree, FakeScrollbar(), db.get_orders_page,
+                                     lambda o: (o.id, o.client_name or "", o.order_date, o.total_cost),
+                                     page_size=7, max_rows=20)
+
+    def expected(self, key, reverse=False):
+        orders = sorted(db.get_all_orders(), key=lambda o: (key(o), o.id), reverse=reverse)
+        return [str(o.id) for o in orders]
+
+    def scroll_to_end(self):
+        while self.view._has_after:
+            self.view._load_next()
+        return self.tree.inserted
+
+    def test_sort_by_pages_through_database(self):
+        """sort_by перечитывает таблицу в порядке базы; при прокрутке строки не теряются и не повторяются."""
+        by_name = self.expected(lambda o: o.client_name or "")
+        self.view.sort_by("client_name", heading="client")
+        self.assertEqual(self.tree.rows, by_name[:14])
+        self.assertEqual(self.tree.headings["client"], "client ▲")
+        self.assertEqual(self.scroll_to_end(), by_name)
+        self.assertEqual(self.tree.rows, by_name[-20:])
+
+        # Прокрутка обратно к началу восстанавливает первые строки
+        while self.view._has_before:
+            self.view._load_previous()
+        self.assertEqual(self.tree.rows, by_name[:20])
+
+        # Повторный щелчок меняет направление, сортировка по другому столбцу снимает стрелку
+        self.tree.inserted = []
+        self.view.sort_by("client_name", heading="client")
+        self.assertEqual(self.tree.headings["client"], "client ▼")
+        self.assertEqual(self.scroll_to_end(), self.expected(lambda o: o.client_name or "", reverse=True))
+        self.tree.inserted = []
+        self.view.sort_by("total_cost", heading="cost")
+        self.assertEqual(self.tree.headings["client"], "client")
+        self.assertEqual(self.scroll_to_end(), self.expected(lambda o: o.total_cost))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,5 +1,5 @@
 import unittest
-from models import Product, Client, Order
+from models import Product, Client, Order, validate_clients
 
 class TestModels(unittest.TestCase):
     def test_client_creation(self):
@@ -34,5 +34,33 @@ class TestModels(unittest.TestCase):
         order = Order(id=1,client_id=1, products=[p1, p2], order_date="2020-01-01")
         self.assertEqual(order.total_cost, 6000)
 
+    def test_order_lines_aggregated(self):
+        """Повторяющиеся товары заказа объединяются в одну позицию."""
+        p1 = Product(name="Мышь", price=1500, id=1)
+        p2 = Product(name="Клавиатура", price=4500, id=2)
+        order = Order(id=1, client_id=1, products=[p1, p2, p1], order_date="2020-01-01")
+        self.assertEqual(order.lines, [(1, 2), (2, 1)])
+        with self.assertRaises(ValueError):
+            Order(id=2, client_id=1, products=[], order_date="2020-01-01", lines=[(1, 0)])
+
+    def test_slots_and_to_dict(self):
+        """Модели без словаря атрибутов; to_dict отдаёт публичные поля, а не скрытые."""
+        client = Client.from_row((7, "Иван", "ivan@example.com", "+79123456789", "Омск", None))
+        self.assertFalse(hasattr(client, "__dict__"))
+        self.assertEqual(client.to_dict(), {"id": 7, "name": "Иван", "email": "ivan@example.com",
+                                            "phone": "+79123456789", "address": "Омск", "city": "Омск"})
+        order = Order.from_row((1, 7, "2020-01-01", "Иван", "Мышь: 2", 3000.0, 2))
+        self.assertEqual(order.to_dict()["total_cost"], 3000.0)
+        self.assertNotIn("_total_cost", order.to_dict())
+
+    def test_validate_clients_batch(self):
+        """Пакетная проверка возвращает ошибки по строкам, не выбрасывая исключений."""
+        errors = validate_clients(["ivan@example.com", "invalid_email", "anna@example.ru"],
+                                  ["+79123456789", "abc", "89011234567"])
+        self.assertIsNone(errors[0])
+        self.assertEqual(errors[1], "Некорректный формат email: invalid_email\n"
+                                    "Некорректный формат телефона: abc")
+        self.assertIsNone(errors[2])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
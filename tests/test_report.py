@@ -0,0 +1,73 @@
+import csv
+import json
+import os
+import unittest
+
+import db
+import report
+from helpers import ShopTestCase
+from models import Order
+
+
+class TestReport(ShopTestCase):
+    def setUp(self):
+        super().setUp()
+        # Заказ за пределами январского периода
+        db.add_order(Order(None, self.anna, [], "2023-02-02 12:00:00", lines=[(self.product, 1)]))
+
+    def test_parse_period(self):
+        """Обе границы периода включительно; верхняя передаётся в базу следующим днём."""
+        self.assertEqual(report.parse_period("2023-01-01:2023-01-31"), ("2023-01-01", "2023-02-01"))
+        self.assertEqual(report.parse_period("2023-01-01:"), ("2023-01-01", None))
+        self.assertEqual(report.period_label(("2023-01-01", "2023-02-01")), "2023-01-01_2023-01-31")
+        for text in ("2023-01-01", "2023-13-01:", "2023-02-01:2023-01-01"):
+            with self.assertRaises(Exception):
+                report.parse_period(text)
+
+    def test_workers_only_read(self):
+        """Задачи пула не пишут в базу: кэш аналитики и города досчитываются до их запуска."""
+        out_dir = self._tmp_dir.name
+        db.backfill_client_cities()
+        db.refresh_analytics()
+        # Заказ после досчёта кэша: попытка дополнить кэш из задачи была бы записью
+        db.add_order(Order(None, self.ivan, [], "2023-03-01 12:00:00", lines=[(self.product, 1)]))
+        conn = db.get_connection()
+        conn.execute("PRAGMA query_only = ON;")
+        try:
+            summary = report.build_segment_report(out_dir, report.ALL_PERIOD, report.ALL_CLIENTS, ("png",), 5)
+            geography = report.build_geography_report(out_dir, ("png",))
+        finally:
+            conn.execute("PRAGMA query_only = OFF;")
+        self.assertEqual(summary["revenue"], 600)
+        self.assertEqual(summary["top_clients"][0], {"client_name": "Анна Смирнова", "total": 500})
+        self.assertEqual(geography["charts"], ["geography.png"])
+
+    def test_generate_reports(self):
+        """Отчёты по периодам и сегментам считаются в пуле процессов и сохраняются с файлами сводки."""
+        out_dir = os.path.join(self._tmp_dir.name, "reports")
+        periods = [report.ALL_PERIOD, report.parse_period("2023-01-01:2023-01-31")]
+        segments = [report.ALL_CLIENTS, "Казань"]
+        reports, geography = report.generate_reports(out_dir, periods, segments, formats=("png", "svg"), workers=2)
+
+        self.assertEqual([(r["period"], r["segment"]) for r in reports], [
+            ("all", "all"), ("all", "Казань"),
+            ("2023-01-01_2023-01-31", "all"), ("2023-01-01_2023-01-31", "Казань"),
+        ])
+        self.assertEqual([r["revenue"] for r in reports], [600, 500, 500, 400])
+        self.assertEqual(reports[3]["top_clients"], [{"client_name": "Анна Смирнова", "total": 400}])
+        self.assertEqual(geography["charts"], ["geography.png", "geography.svg"])
+        for r in reports:
+            self.assertEqual(len(r["charts"]), 2)
+            for file_name in r["charts"]:
+                self.assertGreater(os.path.getsize(os.path.join(out_dir, file_name)), 0)
+
+        with open(os.path.join(out_dir, "summary.json"), encoding="utf-8") as f:
+            self.assertEqual(json.load(f)["reports"], reports)
+        with open(os.path.join(out_dir, "top_clients.csv"), encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[0]["client_name"], "Анна Смирнова")
+
+
+if __name__ == '__main__':
+    unittest.main()
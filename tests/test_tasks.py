@@ -0,0 +1,64 @@
+import threading
+import unittest
+
+from tasks import TaskExecutor
+
+
+class FakeRoot:
+    """Заменитель окна Tk: хранит запланированный через after() колбэк."""
+
+    def __init__(self):
+        self.scheduled = None
+
+    def after(self, delay, callback):
+        self.scheduled = callback
+        return "after#1"
+
+    def after_cancel(self, after_id):
+        self.scheduled = None
+
+
+class TestTaskExecutor(unittest.TestCase):
+    def setUp(self):
+        self.root = FakeRoot()
+        self.executor = TaskExecutor(self.root)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_result_delivered_on_polling_thread(self):
+        """Результат передаётся в колбэк только при опросе очереди из потока интерфейса."""
+        results = []
+        task = self.executor.submit(lambda x: (x * 2, threading.current_thread().name), 21,
+                                    on_done=lambda result: results.append((result, threading.current_thread())))
+        task.future.result(timeout=5)
+        self.assertEqual(results, [])
+        self.root.scheduled()
+        (value, worker_name), callback_thread = results[0]
+        self.assertEqual(value, 42)
+        self.assertTrue(worker_name.startswith("app-worker"))
+        self.assertIs(callback_thread, threading.current_thread())
+
+    def test_error_progress_and_cancel(self):
+        """Задача сообщает о прогрессе, видит отмену, а исключение уходит в on_error."""
+        started, events = threading.Event(), []
+
+        def job(task):
+            task.report_progress(1, 2)
+            started.set()
+            while not task.is_cancelled():
+                pass
+            raise RuntimeError("отменено")
+
+        task = self.executor.submit(job, pass_task=True,
+                                    on_progress=lambda done, total: events.append((done, total)),
+                                    on_error=lambda e: events.append(str(e)))
+        started.wait(timeout=5)
+        task.cancel()
+        task.future.result(timeout=5)
+        self.root.scheduled()
+        self.assertEqual(events, [(1, 2), "отменено"])
+
+
+if __name__ == '__main__':
+    unittest.main()